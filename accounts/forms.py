@@ -1,6 +1,9 @@
 from django import forms
 from django.contrib.auth import get_user_model
 
+from accounts.tasks import resize_profile_image
+from tests.utils import tasks
+
 User = get_user_model()
 
 
@@ -37,4 +40,6 @@ class UserProfileForm(forms.ModelForm):
         if commit:
             profile.save()
             self.instance.save()
+            if profile.profile_image and 'profile_image' in self.changed_data:
+                tasks.enqueue(resize_profile_image, profile_id=profile.pk, name=profile.profile_image.name)
         return self.instance
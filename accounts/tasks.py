@@ -0,0 +1,37 @@
+import io
+import os
+
+from django.core.files.base import ContentFile
+from PIL import Image, ImageOps
+
+from accounts.models import Profile
+from tests.utils.tasks import task
+
+
+PROFILE_IMAGE_SIZE = (512, 512)
+
+
+@task()
+def resize_profile_image(profile_id, name):
+    """
+    Downscale a newly uploaded profile image, unless it was replaced in the meantime.
+    """
+    profile = Profile.objects.filter(pk=profile_id, profile_image=name).first()
+    if profile is None:
+        return
+
+    with profile.profile_image.open('rb') as file:
+        image = Image.open(file)
+        image_format = image.format
+        if image.width <= PROFILE_IMAGE_SIZE[0] and image.height <= PROFILE_IMAGE_SIZE[1]:
+            return
+        image = ImageOps.exif_transpose(image)
+        image.thumbnail(PROFILE_IMAGE_SIZE)
+    if image_format == 'JPEG' and image.mode not in ('RGB', 'L'):
+        image = image.convert('RGB')
+    content = io.BytesIO()
+    image.save(content, format=image_format)
+
+    profile.profile_image.save(os.path.basename(name), ContentFile(content.getvalue()), save=False)
+    Profile.objects.filter(pk=profile_id, profile_image=name).update(profile_image=profile.profile_image.name)
+    profile.profile_image.storage.delete(name)
@@ -1,3 +1,78 @@
-from django.test import TestCase
+import io
+import shutil
+import tempfile
 
-# Create your tests here.
+from django.contrib.auth import get_user_model
+from django.core.files.uploadedfile import SimpleUploadedFile
+from django.test import TestCase, override_settings
+from PIL import Image
+
+from accounts.forms import UserProfileForm
+from accounts.models import Profile
+from accounts.tasks import resize_profile_image
+from tests.models import Task
+from tests.utils import tasks
+
+
+User = get_user_model()
+
+
+def create_image(size, image_format='JPEG'):
+    content = io.BytesIO()
+    Image.new('RGB', size, 'red').save(content, image_format)
+    return SimpleUploadedFile(f'me.{image_format.lower()}', content.getvalue(), f'image/{image_format.lower()}')
+
+
+class ProfileImageTests(TestCase):
+
+    def setUp(self):
+        media_root = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, media_root)
+        self.enterContext(override_settings(MEDIA_ROOT=media_root))
+        self.user = User.objects.create_user('alice', password='password')
+
+    def upload(self, image):
+        form = UserProfileForm({'username': 'alice'}, {'profile_image': image}, instance=self.user)
+        self.assertTrue(form.is_valid(), form.errors)
+        form.save()
+        return Profile.objects.get(user=self.user)
+
+    def run_tasks(self):
+        for task in tasks.claim('worker', 10, 60):
+            self.assertEqual(tasks.execute(task, 'worker'), 'done')
+
+    def test_resize(self):
+        profile = self.upload(create_image((1600, 1200)))
+        original = profile.profile_image.name
+        task = Task.objects.get()
+        self.assertEqual(task.name, resize_profile_image.task_name)
+        self.assertEqual(task.payload, {'profile_id': profile.pk, 'name': original})
+
+        self.run_tasks()
+        profile.refresh_from_db()
+        self.assertNotEqual(profile.profile_image.name, original)
+        self.assertFalse(profile.profile_image.storage.exists(original))
+        with Image.open(profile.profile_image.path) as image:
+            self.assertEqual((image.size, image.format), ((512, 384), 'JPEG'))
+
+    def test_small_image(self):
+        profile = self.upload(create_image((300, 200), 'PNG'))
+        original = profile.profile_image.name
+        self.run_tasks()
+        profile.refresh_from_db()
+        self.assertEqual(profile.profile_image.name, original)
+
+    def test_replaced_image(self):
+        first = self.upload(create_image((1600, 1200))).profile_image.name
+        second = self.upload(create_image((1200, 1600))).profile_image.name
+        self.run_tasks()
+        profile = Profile.objects.get(user=self.user)
+        self.assertNotIn(profile.profile_image.name, (first, second))
+        with Image.open(profile.profile_image.path) as image:
+            self.assertEqual(image.size, (384, 512))
+
+    def test_no_upload(self):
+        form = UserProfileForm({'username': 'alice', 'bio': 'Hello'}, instance=self.user)
+        self.assertTrue(form.is_valid(), form.errors)
+        form.save()
+        self.assertFalse(Task.objects.exists())
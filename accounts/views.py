@@ -1,23 +1,41 @@
 from django.contrib.auth import get_user_model
 from django.contrib.auth.mixins import LoginRequiredMixin
-from django.db.models import Prefetch
+from django.db.models import Count, Max, Prefetch, Sum
 from django.urls import reverse_lazy
 from django.views.generic import DetailView, UpdateView
 
 from accounts.forms import UserProfileForm
+from accounts.models import Profile
 from tests.models import Test, Result
+from tests.utils.views import ConditionalGetMixin
 
 User = get_user_model()
 
 
-class ProfileDetailView(LoginRequiredMixin, DetailView):
+class ProfileDetailView(LoginRequiredMixin, ConditionalGetMixin, DetailView):
     model = User
     template_name = 'pages/profile.html'
     context_object_name = 'user'
 
+    def get_validators(self):
+        user = self.request.user
+        profile = Profile.objects.filter(user=user).values_list('profile_image', 'birth_date', 'bio').first()
+        # Sums of the counters catch passes of the listed tests
+        tests = Test.objects.filter(user=user).aggregate(
+            count=Count('pk'), updated_at=Max('updated_at'),
+            passes_number=Sum('passes_number'), result_count=Sum('statistics__result_count'),
+        )
+        results = Result.objects.filter(user=user).aggregate(
+            count=Count('pk'), updated_at=Max('updated_at'), test_updated_at=Max('test__updated_at'),
+        )
+        values = [user.username, user.email, user.first_name, user.last_name, profile]
+        return values + list(tests.values()) + list(results.values()), None
+
     def get_object(self, queryset=None):
-        tests = Test.objects.filter(user=self.request.user).order_by('-created_at')[:8]
-        results = Result.objects.filter(user=self.request.user).order_by('-created_at')[:8]
+        tests = Test.objects.filter(user=self.request.user).select_related(
+            'user', 'statistics'
+        ).order_by('-created_at')[:8]
+        results = Result.objects.filter(user=self.request.user).select_related('test').order_by('-created_at')[:8]
 
         user = User.objects.prefetch_related(
             Prefetch('tests', queryset=tests, to_attr='latest_tests'),
@@ -0,0 +1,28 @@
+"""
+Gunicorn settings read from the environment, loaded from the working directory.
+
+SERVER_MODE=wsgi (default) runs threaded workers, or sync ones with GUNICORN_THREADS=1. Threaded
+workers keep sending heartbeats while a request runs, so long streamed responses (result exports)
+are not killed after GUNICORN_TIMEOUT like with sync workers.
+SERVER_MODE=asgi runs uvicorn workers serving tests_app.asgi, where the read-heavy views
+(test list, test detail, comments, results) are async; use it with DB_CONN_MAX_AGE=0 and
+DB_POOL or pgbouncer, connections are not reused across requests in async mode.
+"""
+import os
+
+
+server_mode = os.environ.get('SERVER_MODE', 'wsgi')
+
+bind = f':{os.environ.get("PORT", "8000")}'
+workers = int(os.environ.get('WEB_CONCURRENCY', 2))
+timeout = int(os.environ.get('GUNICORN_TIMEOUT', 30))
+accesslog = os.environ.get('GUNICORN_ACCESS_LOG')
+
+if server_mode == 'asgi':
+    wsgi_app = 'tests_app.asgi:application'
+    worker_class = 'uvicorn_worker.UvicornWorker'
+elif server_mode == 'wsgi':
+    wsgi_app = 'tests_app.wsgi:application'
+    threads = int(os.environ.get('GUNICORN_THREADS', 4))
+else:
+    raise ValueError(f'Unknown SERVER_MODE {server_mode!r}, expected wsgi or asgi')
@@ -1,6 +1,10 @@
 from django.contrib import admin
+from django.http import HttpResponse
+from django.shortcuts import get_object_or_404
+from django.urls import path, reverse
+from django.utils.html import format_html
 
-from tests.models import Test, Question, Answer, Result, Comment
+from tests.models import Test, Question, Answer, Result, Comment, CounterIncrement, TestStatistics, ProfileTrace, Task
 
 
 class QuestionInline(admin.TabularInline):
@@ -46,3 +50,65 @@ class ResultAdmin(admin.ModelAdmin):
 class CommentAdmin(admin.ModelAdmin):
     list_display = ['test', 'text', 'created_at', 'updated_at']
 
+
+@admin.register(CounterIncrement)
+class CounterIncrementAdmin(admin.ModelAdmin):
+    list_display = ['content_type', 'object_id', 'field', 'delta', 'created_at']
+
+
+@admin.register(TestStatistics)
+class TestStatisticsAdmin(admin.ModelAdmin):
+    list_display = ['test', 'result_count', 'score_sum', 'question_sum']
+
+
+@admin.register(ProfileTrace)
+class ProfileTraceAdmin(admin.ModelAdmin):
+    list_display = ['created_at', 'method', 'path', 'status_code', 'duration_ms', 'query_count', 'user', 'download']
+    list_filter = ['view_name', 'method']
+    exclude = ['stats', 'report', 'queries']
+    readonly_fields = ['user', 'method', 'path', 'view_name', 'status_code', 'duration', 'query_count',
+                       'created_at', 'download', 'formatted_report', 'formatted_queries']
+
+    def has_add_permission(self, request):
+        return False
+
+    def has_change_permission(self, request, obj=None):
+        return False
+
+    def get_urls(self):
+        return [
+            path('<int:pk>/download/', self.admin_site.admin_view(self.download_view),
+                 name='tests_profiletrace_download'),
+        ] + super().get_urls()
+
+    def download_view(self, request, pk):
+        if not self.has_view_permission(request):
+            return HttpResponse(status=403)
+        trace = get_object_or_404(ProfileTrace, pk=pk)
+        response = HttpResponse(bytes(trace.stats), content_type='application/octet-stream')
+        response['Content-Disposition'] = f'attachment; filename="trace-{trace.pk}.prof"'
+        return response
+
+    @admin.display(description='Duration (ms)', ordering='duration')
+    def duration_ms(self, obj):
+        return round(obj.duration * 1000, 1)
+
+    @admin.display(description='pstats dump')
+    def download(self, obj):
+        return format_html('<a href="{}">trace-{}.prof</a>',
+                           reverse('admin:tests_profiletrace_download', args=[obj.pk]), obj.pk)
+
+    @admin.display(description='Report')
+    def formatted_report(self, obj):
+        return format_html('<pre>{}</pre>', obj.report)
+
+    @admin.display(description='Queries')
+    def formatted_queries(self, obj):
+        return format_html('<pre>{}</pre>', '\n'.join(f'{query["ms"]:>9} ms  {query["sql"]}' for query in obj.queries))
+
+
+@admin.register(Task)
+class TaskAdmin(admin.ModelAdmin):
+    list_display = ['name', 'status', 'attempts', 'max_attempts', 'run_at', 'locked_by', 'updated_at']
+    list_filter = ['status', 'name']
+    readonly_fields = ['locked_by', 'locked_until', 'created_at', 'updated_at']
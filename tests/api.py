@@ -0,0 +1,275 @@
+import json
+from collections import Counter
+
+from django.contrib.auth import get_user_model
+from django.db import transaction
+from django.http import HttpResponse
+from django.shortcuts import get_object_or_404
+from rest_framework import pagination, permissions, status, viewsets
+from rest_framework.decorators import action
+from rest_framework.parsers import MultiPartParser
+from rest_framework.exceptions import NotAuthenticated, PermissionDenied, ValidationError
+from rest_framework.response import Response
+from rest_framework.routers import DefaultRouter
+from rest_framework.utils.urls import replace_query_param
+
+from tests.models import Test, Result
+from tests.serializers import ResultSerializer, TestDetailSerializer, TestSerializer, serialize_snapshot
+from tests.utils import caching, counters, imports, metrics, snapshots, statistics
+from tests.utils.grading import InvalidSubmission
+from tests.utils.pagination import get_cursor_ordering, paginate_by_cursor
+from tests.views import TestListFilterMixin
+
+
+User = get_user_model()
+
+
+class CursorPagination(pagination.BasePagination):
+    """
+    Keyset pagination of tests.utils.pagination for viewsets, with `next` and
+    `previous` links. The list is not counted.
+    """
+
+    cursor_query_param = 'cursor'
+    page_size = 20
+    page_size_query_param = 'page_size'
+    max_page_size = 100
+
+    def get_page_size(self, request):
+        try:
+            page_size = int(request.query_params[self.page_size_query_param])
+        except (KeyError, ValueError):
+            return self.page_size
+        return min(max(page_size, 1), self.max_page_size)
+
+    def paginate_queryset(self, queryset, request, view=None):
+        self.request = request
+        self.page = paginate_by_cursor(
+            queryset, self.get_page_size(request), request.query_params.get(self.cursor_query_param),
+        )
+        return self.page.object_list
+
+    def get_link(self, cursor):
+        if cursor is None:
+            return None
+        return replace_query_param(self.request.build_absolute_uri(), self.cursor_query_param, cursor)
+
+    def get_paginated_response(self, data):
+        return Response({
+            'next': self.get_link(self.page.next_cursor),
+            'previous': self.get_link(self.page.previous_cursor),
+            'results': data,
+        })
+
+
+class ReadSerializerMixin:
+    """
+    Serializes with the ReadSerializer of the action, restricted to the fields
+    asked for with `?fields=name,author`.
+    """
+
+    serializer_class = None
+    detail_serializer_class = None
+
+    def get_read_serializer(self):
+        serializer_class = self.serializer_class
+        if self.detail and self.detail_serializer_class:
+            serializer_class = self.detail_serializer_class
+        names = [name.strip() for name in self.request.query_params.get('fields', '').split(',') if name.strip()]
+        return serializer_class(names)
+
+    def list(self, request, *args, **kwargs):
+        serializer = self.get_read_serializer()
+        queryset = self.get_queryset()
+        # The cursor reads the ordering column
+        name, _, _ = get_cursor_ordering(queryset)
+        ordering = [name] if name and name not in queryset.query.annotations else []
+        page = self.paginate_queryset(serializer.shape_queryset(queryset, *ordering))
+        return self.get_paginated_response(serializer.serialize(page))
+
+    def retrieve(self, request, *args, **kwargs):
+        serializer = self.get_read_serializer()
+        queryset = serializer.shape_queryset(self.get_queryset())
+        obj = get_object_or_404(queryset, pk=self.kwargs['pk'])
+        return Response(serializer.to_representation(obj))
+
+
+class TestViewSet(TestListFilterMixin, ReadSerializerMixin, viewsets.GenericViewSet):
+    """
+    Tests with the search, filters and sorts of the test list, and the questions
+    of a test for passing it.
+    """
+
+    queryset = Test.objects.all()
+    serializer_class = TestSerializer
+    detail_serializer_class = TestDetailSerializer
+    pagination_class = CursorPagination
+
+    def get_queryset(self):
+        queryset = super().get_queryset()
+        if self.action != 'list':
+            return queryset
+        if self.get_list_params()['list_type'] == 'my' and not self.request.user.is_authenticated:
+            raise NotAuthenticated
+        return self.filter_tests(queryset)
+
+    @action(detail=True, permission_classes=[permissions.IsAuthenticated])
+    def questions(self, request, pk=None):
+        get_object_or_404(Test.objects.only('pk'), pk=pk)
+        return Response(serialize_snapshot(snapshots.get_snapshot(int(pk))))
+
+    @action(detail=False, methods=['post'], url_path='import', parser_classes=[MultiPartParser],
+            permission_classes=[permissions.IsAuthenticated])
+    def import_tests(self, request):
+        """
+        Import the question bank uploaded as `file` (see tests.utils.imports) as tests of the
+        current user, in the format of ?import_format= or of the file extension. The progress
+        after every chunk is returned as JSON Lines once the whole file has been imported.
+        """
+        file = request.FILES.get('file')
+        if file is None:
+            raise ValidationError({'file': ['A JSON Lines or CSV file is required.']})
+        # Not ?format=, which DRF takes for the format of the response
+        import_format = request.query_params.get('import_format') or imports.get_format(file.name)
+        if import_format not in imports.IMPORT_FORMATS:
+            raise ValidationError({'import_format': [f'One of {", ".join(imports.IMPORT_FORMATS)}.']})
+
+        reader = imports.read_jsonl if import_format == 'jsonl' else imports.read_csv
+        # Imported before responding, so that a client going away does not stop the import halfway
+        progress = list(imports.import_tests(reader(imports.decode_lines(file)), request.user))
+        content = ''.join(json.dumps(item) + '\n' for item in progress)
+        return HttpResponse(content, content_type='application/x-ndjson; charset=utf-8')
+
+
+class ResultViewSet(ReadSerializerMixin, viewsets.GenericViewSet):
+    """
+    Results of the current user, newest first.
+    """
+
+    serializer_class = ResultSerializer
+    pagination_class = CursorPagination
+    permission_classes = [permissions.IsAuthenticated]
+
+    def get_queryset(self):
+        return Result.objects.filter(user=self.request.user).order_by('-created_at')
+
+
+def _is_id(value):
+    # JSON true and false are ints in Python
+    return isinstance(value, int) and not isinstance(value, bool)
+
+
+class SubmissionViewSet(viewsets.ViewSet):
+    """
+    Batch of test submissions, e.g. a classroom at the end of a proctored session
+    relayed at once or an offline client catching up:
+        {"submissions": [{"test": 1, "user": 2, "answers": {"<question id>": <answer id>}}]}
+    `user` defaults to the current user, only staff users may submit for others
+    (owning a test does not make its results yours to write). The batch is graded against one answer key per test
+    and saved with one INSERT of results and one of aggregated counter increments.
+    Invalid batches are rejected as a whole.
+    """
+
+    permission_classes = [permissions.IsAuthenticated]
+    max_batch_size = 1000
+
+    def get_submissions(self):
+        submissions = self.request.data.get('submissions') if isinstance(self.request.data, dict) else None
+        if not isinstance(submissions, list) or not submissions:
+            raise ValidationError({'submissions': ['A non-empty list of submissions is required.']})
+        if len(submissions) > self.max_batch_size:
+            raise ValidationError({'submissions': [f'At most {self.max_batch_size} submissions per batch.']})
+
+        errors = {}
+        for index, submission in enumerate(submissions):
+            if not isinstance(submission, dict):
+                errors[index] = ['Must be an object.']
+            elif not _is_id(submission.get('test')):
+                errors[index] = ['`test` must be a test id.']
+            elif not _is_id(submission.get('user', self.request.user.pk)):
+                errors[index] = ['`user` must be a user id.']
+            elif not isinstance(submission.get('answers'), dict) or not all(
+                answer_id is None or _is_id(answer_id) for answer_id in submission['answers'].values()
+            ):
+                errors[index] = ['`answers` must map question ids to answer ids.']
+        if errors:
+            raise ValidationError({'submissions': errors})
+        return submissions
+
+    def check_submitters(self, submissions):
+        user = self.request.user
+        others = [submission for submission in submissions if submission.get('user', user.pk) != user.pk]
+        if not others:
+            return
+        if not user.is_staff:
+            raise PermissionDenied('Only staff users may submit for other users.')
+        user_ids = {submission['user'] for submission in others}
+        missing = user_ids - set(User.objects.filter(pk__in=user_ids).values_list('pk', flat=True))
+        if missing:
+            raise ValidationError({'submissions': [f'Unknown users: {", ".join(map(str, sorted(missing)))}.']})
+
+    def create(self, request, *args, **kwargs):
+        submissions = self.get_submissions()
+        test_ids = {submission['test'] for submission in submissions}
+        self.check_submitters(submissions)
+        missing = test_ids - set(Test.objects.filter(pk__in=test_ids).values_list('pk', flat=True))
+        if missing:
+            raise ValidationError({'submissions': [f'Unknown tests: {", ".join(map(str, sorted(missing)))}.']})
+
+        answer_keys = {test_id: snapshot.answer_key for test_id, snapshot in snapshots.get_snapshots(test_ids).items()}
+        results, errors = [], {}
+        with metrics.timer('stage_seconds', stage='batch_grading'):
+            for index, submission in enumerate(submissions):
+                answer_key = answer_keys[submission['test']]
+                question_ids = {str(question_id) for question_id in answer_key.answers}
+                unknown = [key for key in submission['answers'] if key not in question_ids]
+                if unknown:
+                    errors[index] = [f'Not questions of test {submission["test"]}: {", ".join(unknown)}.']
+                    continue
+                data = {
+                    f'question_{question_id}': answer_id for question_id, answer_id in submission['answers'].items()
+                }
+                try:
+                    grading = answer_key.grade(data)
+                except InvalidSubmission as error:
+                    errors[index] = [str(error)]
+                    continue
+                results.append(Result(
+                    user_id=submission.get('user', request.user.pk),
+                    test_id=submission['test'],
+                    score=grading.score,
+                    question_count=grading.question_count,
+                ))
+        if errors:
+            raise ValidationError({'submissions': errors})
+
+        with transaction.atomic():
+            results = Result.objects.bulk_create(results)
+            passes = Counter(result.test_id for result in results)
+            counters.increment_bulk({
+                **{Test(pk=test_id): {'passes_number': count} for test_id, count in passes.items()},
+                **statistics.get_deltas(results),
+            })
+            # Bulk inserts send no signals
+            for user_id in {result.user_id for result in results}:
+                caching.invalidate_on_commit(User, user_id)
+        metrics.increment('batch_submissions_total', len(results))
+
+        return Response({'results': [
+            {
+                'id': result.pk,
+                'test': result.test_id,
+                'user': result.user_id,
+                'score': result.score,
+                'question_count': result.question_count,
+            }
+            for result in results
+        ]}, status=status.HTTP_201_CREATED)
+
+
+router = DefaultRouter()
+router.register('tests', TestViewSet, basename='api-test')
+router.register('results', ResultViewSet, basename='api-result')
+router.register('submissions', SubmissionViewSet, basename='api-submission')
+
+urlpatterns = router.urls
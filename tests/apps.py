@@ -7,3 +7,4 @@ class TestsConfig(AppConfig):
 
     def ready(self):
         import tests.templatetags.custom_tags
+        import tests.signals
@@ -1,8 +1,12 @@
 from django import forms
+from django.core.exceptions import ValidationError
 from django.forms import inlineformset_factory
+from django.utils import timezone
 from django.utils.translation import ngettext_lazy
 
 from tests.models import Test, Question, Answer, Comment
+from tests.utils import caching
+from tests.utils.snapshots import invalidate_snapshot
 
 
 class TestForm(forms.ModelForm):
@@ -13,6 +17,13 @@ class TestForm(forms.ModelForm):
             'description': forms.Textarea(attrs={'rows': 3}),
         }
 
+    def save(self, commit=True):
+        if not commit or self.instance._state.adding:
+            return super().save(commit)
+        # Writing the whole row would overwrite counters flushed since it was read
+        self.instance.save(update_fields=[*self._meta.fields, 'updated_at'])
+        return self.instance
+
 
 class QuestionForm(forms.ModelForm):
 
@@ -42,7 +53,57 @@ class AnswerForm(forms.ModelForm):
             self.fields['letter'].initial = Answer.LETTERS[int(index)][0]
 
 
-class BaseQuestionFormSet(forms.BaseInlineFormSet):
+class PrefetchedModelChoiceField(forms.ModelChoiceField):
+    """
+    Choice among already fetched objects, so cleaning an id runs no query.
+    """
+
+    def __init__(self, objects, **kwargs):
+        super().__init__(queryset=None, **kwargs)
+        self.objects = objects
+
+    def to_python(self, value):
+        if value in self.empty_values:
+            return None
+        try:
+            return self.objects[int(value)]
+        except (KeyError, TypeError, ValueError):
+            raise ValidationError(self.error_messages['invalid_choice'], code='invalid_choice')
+
+
+class PrefetchedInlineFormSetMixin:
+    """
+    Takes the objects of the parent instance from its prefetch cache when they were
+    prefetched (e.g. `prefetch_related('questions__answers')`), so building and
+    validating a formset of existing objects runs no queries.
+    """
+
+    def get_prefetched_objects(self):
+        accessor = self.fk.remote_field.get_accessor_name()
+        return getattr(self.instance, '_prefetched_objects_cache', {}).get(accessor)
+
+    def get_queryset(self):
+        if not hasattr(self, '_queryset'):
+            prefetched = self.get_prefetched_objects()
+            if prefetched is None:
+                return super().get_queryset()
+            self._queryset = list(prefetched)
+        return self._queryset
+
+    def add_fields(self, form, index):
+        super().add_fields(form, index)
+        if self.get_prefetched_objects() is None:
+            return
+        pk_field = form.fields[self._pk_field.name]
+        form.fields[self._pk_field.name] = PrefetchedModelChoiceField(
+            {obj.pk: obj for obj in self.get_queryset()},
+            initial=pk_field.initial,
+            required=False,
+            widget=pk_field.widget,
+        )
+
+
+class BaseQuestionFormSet(PrefetchedInlineFormSetMixin, forms.BaseInlineFormSet):
 
     def __init__(self, *args, **kwargs):
         error_messages = kwargs.pop('error_messages', {})
@@ -56,7 +117,7 @@ class BaseQuestionFormSet(forms.BaseInlineFormSet):
             form.empty_permitted = False
 
 
-class BaseAnswerFormSet(forms.BaseInlineFormSet):
+class BaseAnswerFormSet(PrefetchedInlineFormSetMixin, forms.BaseInlineFormSet):
 
     def __init__(self, *args, **kwargs):
         super().__init__(*args, **kwargs)
@@ -87,6 +148,89 @@ AnswerFormSet = inlineformset_factory(Question, Answer, form=AnswerForm,
                                       validate_min=True, validate_max=True)
 
 
+class TestFormTree:
+    """
+    The question formset of a test together with the answer formset of every
+    question, built once per request and used for validation, saving and rendering.
+    """
+
+    template_question_prefix = 'questions-__question_prefix__'
+
+    def __init__(self, data=None, instance=None):
+        self.question_formset = QuestionFormSet(data, instance=instance)
+        initial_question_count = self.question_formset.initial_form_count()
+        self.answer_formsets = [
+            AnswerFormSet(
+                data,
+                instance=question_form.instance if index < initial_question_count else None,
+                prefix=f'{question_form.prefix}-answers',
+            )
+            for index, question_form in enumerate(self.question_formset)
+        ]
+
+    def get_kept_question_forms(self):
+        deleted_forms = self.question_formset.deleted_forms
+        return [
+            (question_form, answer_formset)
+            for question_form, answer_formset in zip(self.question_formset, self.answer_formsets)
+            if question_form not in deleted_forms
+        ]
+
+    def is_valid(self):
+        """
+        Validate the question formset and the answer formsets of the questions
+        that are kept, collecting the errors of all of them.
+        """
+        valid = self.question_formset.is_valid()
+        for _, answer_formset in self.get_kept_question_forms():
+            valid = answer_formset.is_valid() and valid
+        return valid
+
+    def save(self, test):
+        """
+        Write the validated tree of `test` with a fixed number of statements:
+        one bulk INSERT and one bulk UPDATE per model, touching only new and changed
+        rows (plus the deletion of removed questions).
+        """
+        now = timezone.now()
+
+        self.question_formset.instance = test
+        self.question_formset.save(commit=False)
+        if self.question_formset.deleted_objects:
+            deleted_ids = [question.pk for question in self.question_formset.deleted_objects]
+            Question.objects.filter(pk__in=deleted_ids).delete()
+        Question.objects.bulk_create(self.question_formset.new_objects)
+        changed_questions = [question for question, _ in self.question_formset.changed_objects]
+        for question in changed_questions:
+            question.updated_at = now
+        Question.objects.bulk_update(changed_questions, ['text', 'updated_at'])
+
+        new_answers, changed_answers = [], []
+        for question_form, answer_formset in self.get_kept_question_forms():
+            answer_formset.instance = question_form.instance
+            answer_formset.save(commit=False)
+            new_answers += answer_formset.new_objects
+            changed_answers += [answer for answer, _ in answer_formset.changed_objects]
+        Answer.objects.bulk_create(new_answers)
+        for answer in changed_answers:
+            answer.updated_at = now
+        Answer.objects.bulk_update(changed_answers, ['letter', 'text', 'is_correct', 'updated_at'])
+
+        # Bulk writes send no signals
+        caching.invalidate_on_commit(Test, test.pk)
+        invalidate_snapshot(test.pk)
+
+    def get_context_data(self):
+        return {
+            'question_formset': self.question_formset,
+            'answer_formsets': self.answer_formsets,
+            'active_question_count': len(self.question_formset) - len(self.question_formset.deleted_forms),
+            'empty_question_form': self.question_formset.empty_form,
+            'template_answer_formset': AnswerFormSet(prefix=f'{self.template_question_prefix}-answers'),
+            'template_question_prefix': self.template_question_prefix,
+        }
+
+
 class CommentForm(forms.ModelForm):
 
     class Meta:
@@ -0,0 +1,65 @@
+import time
+
+from django.contrib.auth import get_user_model
+from django.contrib.postgres.indexes import GinIndex
+from django.core.management.base import BaseCommand
+from django.db import connection, transaction
+
+from tests.models import Test, Result, Comment
+
+
+User = get_user_model()
+
+
+class Command(BaseCommand):
+    help = ('Show query plans and timings of the list page queries with the composite indexes '
+            'of the tests app and without them. The indexes are dropped inside a transaction '
+            'that is rolled back, which locks the tables meanwhile: do not run against production.')
+
+    def add_arguments(self, parser):
+        parser.add_argument('--repeat', type=int, default=20)
+        parser.add_argument('--page-size', type=int, default=10)
+
+    def get_scenarios(self, page_size):
+        user = User.objects.filter(tests__isnull=False).first()
+        result_user = User.objects.filter(results__isnull=False).first()
+        test = Test.objects.filter(comments__isnull=False).first()
+        scenarios = {
+            'test_list newest': Test.objects.order_by('-created_at', '-pk'),
+            'test_list most passed': Test.objects.order_by('-passes_number', '-pk'),
+            'test_list name': Test.objects.order_by('name', 'pk'),
+            'test_list passes range': Test.objects.filter(passes_number__gte=10, passes_number__lte=100)
+                                                  .order_by('passes_number', 'pk'),
+        }
+        if user:
+            scenarios['test_list my'] = Test.objects.filter(user=user).order_by('-created_at', '-pk')
+        if result_user:
+            scenarios['test_results'] = Result.objects.filter(user=result_user).order_by('-created_at', '-pk')
+        if test:
+            scenarios['test_detail comments'] = Comment.objects.filter(test=test).order_by('-created_at', '-pk')
+        return {name: queryset[:page_size + 1] for name, queryset in scenarios.items()}
+
+    def report(self, title, scenarios, repeat):
+        self.stdout.write(self.style.MIGRATE_HEADING(title))
+        for name, queryset in scenarios.items():
+            start = time.perf_counter()
+            for _ in range(repeat):
+                list(queryset.all())
+            elapsed = (time.perf_counter() - start) / repeat * 1000
+            self.stdout.write(self.style.MIGRATE_LABEL(f'  {name}: {elapsed:.2f} ms'))
+            for line in queryset.explain().splitlines():
+                self.stdout.write(f'    {line}')
+
+    def handle(self, *args, **options):
+        scenarios = self.get_scenarios(options['page_size'])
+        self.report('With indexes', scenarios, options['repeat'])
+
+        schema_editor = connection.schema_editor()
+        with transaction.atomic():
+            with connection.cursor() as cursor:
+                for model in (Test, Result, Comment):
+                    for index in model._meta.indexes:
+                        if not isinstance(index, GinIndex):
+                            cursor.execute(str(index.remove_sql(model, schema_editor)))
+            self.report('Without indexes', scenarios, options['repeat'])
+            transaction.set_rollback(True)
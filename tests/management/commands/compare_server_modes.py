@@ -0,0 +1,99 @@
+import os
+import statistics
+import subprocess
+import sys
+import threading
+import time
+
+import requests
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+
+
+class Command(BaseCommand):
+    help = ('Serve the project with gunicorn in WSGI and in ASGI mode (see gunicorn.conf.py) '
+            'and compare throughput and latency of the given paths under concurrent load. '
+            'Both servers use the configured database, run it against a local or staging copy.')
+
+    def add_arguments(self, parser):
+        parser.add_argument('paths', nargs='*', default=['/tests/'])
+        parser.add_argument('--modes', nargs='+', choices=['wsgi', 'asgi'], default=['wsgi', 'asgi'])
+        parser.add_argument('--concurrency', type=int, default=20)
+        parser.add_argument('--duration', type=float, default=10.0, help='Seconds of load per path')
+        parser.add_argument('--workers', type=int, default=2)
+        parser.add_argument('--threads', type=int, default=1, help='Threads per WSGI worker')
+        parser.add_argument('--port', type=int, default=8765)
+
+    def start_server(self, mode, options):
+        env = {
+            **os.environ,
+            'SERVER_MODE': mode,
+            'PORT': str(options['port']),
+            'WEB_CONCURRENCY': str(options['workers']),
+            'GUNICORN_THREADS': str(options['threads']),
+        }
+        server = subprocess.Popen(
+            [sys.executable, '-m', 'gunicorn'],
+            cwd=settings.BASE_DIR, env=env, stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL,
+        )
+        base_url = f'http://localhost:{options["port"]}'
+        deadline = time.monotonic() + 30
+        while time.monotonic() < deadline:
+            if server.poll() is not None:
+                raise CommandError(f'gunicorn exited in {mode} mode with code {server.returncode}')
+            try:
+                requests.get(base_url, timeout=1)
+                return server, base_url
+            except requests.ConnectionError:
+                time.sleep(0.2)
+        server.terminate()
+        raise CommandError(f'gunicorn did not start in {mode} mode')
+
+    def load(self, url, concurrency, duration):
+        latencies, errors = [], []
+        lock = threading.Lock()
+        deadline = time.monotonic() + duration
+
+        def client():
+            session = requests.Session()
+            while time.monotonic() < deadline:
+                start = time.perf_counter()
+                try:
+                    response = session.get(url, allow_redirects=False, timeout=30)
+                    failed = response.status_code >= 500
+                except requests.RequestException:
+                    failed = True
+                elapsed = time.perf_counter() - start
+                with lock:
+                    (errors if failed else latencies).append(elapsed)
+
+        clients = [threading.Thread(target=client) for _ in range(concurrency)]
+        for thread in clients:
+            thread.start()
+        for thread in clients:
+            thread.join()
+        return latencies, len(errors)
+
+    def handle(self, *args, **options):
+        rows = []
+        for mode in options['modes']:
+            server, base_url = self.start_server(mode, options)
+            try:
+                for path in options['paths']:
+                    latencies, errors = self.load(f'{base_url}{path}', options['concurrency'], options['duration'])
+                    rows.append((mode, path, len(latencies), errors, latencies))
+            finally:
+                server.terminate()
+                server.wait()
+
+        self.stdout.write(
+            f'{"mode":<6}{"path":<30}{"requests":>10}{"errors":>8}{"req/s":>10}{"p50 ms":>10}{"p99 ms":>10}'
+        )
+        for mode, path, count, errors, latencies in rows:
+            if len(latencies) > 1:
+                percentiles = statistics.quantiles(latencies, n=100)
+                p50, p99 = percentiles[49] * 1000, percentiles[98] * 1000
+            else:
+                p50 = p99 = float('nan')
+            rate = count / options['duration']
+            self.stdout.write(f'{mode:<6}{path:<30}{count:>10}{errors:>8}{rate:>10.1f}{p50:>10.1f}{p99:>10.1f}')
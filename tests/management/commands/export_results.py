@@ -0,0 +1,29 @@
+from django.core.management.base import BaseCommand, CommandError
+
+from tests.models import Test
+from tests.utils import exports
+
+
+class Command(BaseCommand):
+    help = 'Stream all results of a test as CSV or JSON Lines to a file or stdout, in constant memory.'
+
+    def add_arguments(self, parser):
+        parser.add_argument('test_id', type=int)
+        parser.add_argument('--format', choices=list(exports.EXPORT_CONTENT_TYPES), default='csv')
+        parser.add_argument('--output', default='-', help='File path, - for stdout')
+        parser.add_argument('--chunk-size', type=int, default=2000)
+
+    def handle(self, *args, **options):
+        if not Test.objects.filter(pk=options['test_id']).exists():
+            raise CommandError(f'Test {options["test_id"]} does not exist')
+
+        chunks = exports.stream_results(options['test_id'], options['format'], options['chunk_size'])
+        if options['output'] == '-':
+            for chunk in chunks:
+                self.stdout.write(chunk, ending='')
+            return
+
+        with open(options['output'], 'w', newline='', encoding='utf-8') as file:
+            for chunk in chunks:
+                file.write(chunk)
+        self.stderr.write(self.style.SUCCESS(f'Wrote {options["output"]}'))
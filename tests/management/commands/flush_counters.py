@@ -0,0 +1,16 @@
+from django.core.management.base import BaseCommand
+
+from tests.utils import counters
+
+
+class Command(BaseCommand):
+    help = 'Apply pending counter increments (e.g. Test.passes_number)'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--batch-size', type=int, default=1000)
+
+    def handle(self, *args, **options):
+        total = 0
+        while applied := counters.flush(batch_size=options['batch_size']):
+            total += applied
+        self.stdout.write(self.style.SUCCESS(f'Applied {total} counter increments'))
@@ -0,0 +1,138 @@
+import random
+
+from django.contrib.auth import get_user_model
+from django.contrib.auth.hashers import make_password
+from django.core.management.base import BaseCommand
+from django.db.models import Count, OuterRef, Subquery
+from django.db.models.functions import Coalesce
+
+from accounts.models import Profile
+from tests.models import Test, Question, Answer, Result, Comment
+from tests.utils import caching, statistics
+from tests.utils.benchmarks import BENCHMARK_USERNAME_PREFIX
+from tests.utils.search import get_search_vector, is_full_text_supported
+
+
+User = get_user_model()
+
+WORDS = ('python django query index cache async worker result score answer question test '
+         'history geography physics biology algebra grammar music art chemistry database '
+         'network security design pattern function variable loop class module package').split()
+
+
+class Command(BaseCommand):
+    help = ('Fill the database with a synthetic data set for benchmarks: users, tests with '
+            'questions and answers, results and comments, written with bulk inserts. '
+            'Counters, statistics and search vectors are recomputed afterwards.')
+
+    def add_arguments(self, parser):
+        parser.add_argument('--users', type=int, default=2000)
+        parser.add_argument('--tests', type=int, default=5000)
+        parser.add_argument('--min-questions', type=int, default=5)
+        parser.add_argument('--max-questions', type=int, default=100)
+        parser.add_argument('--results', type=int, default=1_000_000)
+        parser.add_argument('--comments', type=int, default=1_000_000)
+        parser.add_argument('--batch-size', type=int, default=5000)
+        parser.add_argument('--seed', type=int, default=0)
+
+    def get_text(self, words):
+        return ' '.join(self.random.choices(WORDS, k=words)).capitalize()
+
+    def create_users(self, count, batch_size):
+        start = User.objects.filter(username__startswith=BENCHMARK_USERNAME_PREFIX).count()
+        # Hashing is slow, every benchmark user shares the password `benchmark`
+        password = make_password('benchmark')
+        users = User.objects.bulk_create([
+            User(username=f'{BENCHMARK_USERNAME_PREFIX}{start + index}', password=password)
+            for index in range(count)
+        ], batch_size=batch_size)
+        Profile.objects.bulk_create([Profile(user=user) for user in users], batch_size=batch_size)
+        return [user.pk for user in users]
+
+    def create_tests(self, count, user_ids, min_questions, max_questions, batch_size):
+        """
+        Return {test id: question count} of the created tests.
+        """
+        question_counts = {}
+        # Chunks keep the questions and answers of a few hundred tests in memory
+        chunk_size = 200
+        for offset in range(0, count, chunk_size):
+            tests = Test.objects.bulk_create([
+                Test(user_id=self.random.choice(user_ids), name=self.get_text(3), description=self.get_text(12))
+                for _ in range(min(chunk_size, count - offset))
+            ])
+            questions = []
+            for test in tests:
+                question_count = self.random.randint(min_questions, max_questions)
+                question_counts[test.pk] = question_count
+                questions += [Question(test=test, text=f'{self.get_text(6)}?') for _ in range(question_count)]
+            questions = Question.objects.bulk_create(questions, batch_size=batch_size)
+
+            answers = []
+            for question in questions:
+                correct = self.random.randrange(len(Answer.LETTERS))
+                answers += [
+                    Answer(question=question, letter=letter, text=self.get_text(3), is_correct=index == correct)
+                    for index, (letter, _) in enumerate(Answer.LETTERS)
+                ]
+            Answer.objects.bulk_create(answers, batch_size=batch_size)
+            self.stdout.write(f'  {offset + len(tests)}/{count} tests')
+        return question_counts
+
+    def create_rows(self, model, count, make_row, batch_size):
+        for offset in range(0, count, batch_size):
+            model.objects.bulk_create([make_row() for _ in range(min(batch_size, count - offset))])
+            self.stdout.write(f'  {offset + min(batch_size, count - offset)}/{count} {model._meta.verbose_name_plural}')
+
+    def make_result(self, user_ids, question_counts, test_ids):
+        test_id = self.random.choice(test_ids)
+        question_count = question_counts[test_id]
+        return Result(
+            user_id=self.random.choice(user_ids),
+            test_id=test_id,
+            score=self.random.randint(0, question_count),
+            question_count=question_count,
+        )
+
+    def update_derived_data(self, test_ids, batch_size):
+        for offset in range(0, len(test_ids), batch_size):
+            tests = Test.objects.filter(pk__in=test_ids[offset:offset + batch_size])
+            result_count = Result.objects.filter(test=OuterRef('pk')).values('test').annotate(count=Count('pk'))
+            comment_count = Comment.objects.filter(test=OuterRef('pk')).values('test').annotate(count=Count('pk'))
+            tests.update(
+                passes_number=Coalesce(Subquery(result_count.values('count')), 0),
+                comment_count=Coalesce(Subquery(comment_count.values('count')), 0),
+            )
+            if is_full_text_supported():
+                tests.update(search_vector=get_search_vector())
+        statistics.rebuild(test_ids)
+        # Bulk writes send no signals
+        caching.invalidate(Test)
+
+    def handle(self, *args, **options):
+        self.random = random.Random(options['seed'])
+        batch_size = options['batch_size']
+
+        self.stdout.write('Users')
+        user_ids = self.create_users(options['users'], batch_size)
+        self.stdout.write('Tests')
+        question_counts = self.create_tests(
+            options['tests'], user_ids, options['min_questions'], options['max_questions'], batch_size,
+        )
+        test_ids = list(question_counts)
+
+        self.stdout.write('Results')
+        self.create_rows(
+            Result, options['results'], lambda: self.make_result(user_ids, question_counts, test_ids), batch_size,
+        )
+        self.stdout.write('Comments')
+        self.create_rows(Comment, options['comments'], lambda: Comment(
+            user_id=self.random.choice(user_ids), test_id=self.random.choice(test_ids), text=self.get_text(15),
+        ), batch_size)
+
+        self.stdout.write('Counters, statistics and search vectors')
+        self.update_derived_data(test_ids, batch_size)
+        self.stdout.write(self.style.SUCCESS(
+            f'Created {len(user_ids)} users, {len(test_ids)} tests, '
+            f'{options["results"]} results and {options["comments"]} comments'
+        ))
@@ -0,0 +1,45 @@
+import sys
+
+from django.contrib.auth import get_user_model
+from django.core.management.base import BaseCommand, CommandError
+
+from tests.utils import imports
+
+
+User = get_user_model()
+
+
+class Command(BaseCommand):
+    help = ('Import a question bank of tests from JSON Lines or CSV (see tests.utils.imports), validated '
+            'like the test editor and saved in chunks. Reports progress and the errors of every record.')
+
+    def add_arguments(self, parser):
+        parser.add_argument('path', help='File path, - for stdin')
+        parser.add_argument('--user', required=True, help='Username of the owner of the imported tests')
+        parser.add_argument('--format', choices=imports.IMPORT_FORMATS, help='By default from the file extension')
+        parser.add_argument('--chunk-size', type=int, default=100, help='Tests per transaction')
+
+    def handle(self, *args, **options):
+        try:
+            user = User.objects.get(username=options['user'])
+        except User.DoesNotExist:
+            raise CommandError(f'User {options["user"]} does not exist')
+        import_format = options['format'] or imports.get_format(options['path'])
+        if import_format is None:
+            raise CommandError('Cannot tell the format from the file name, use --format')
+
+        file = sys.stdin.buffer if options['path'] == '-' else open(options['path'], 'rb')
+        with file:
+            reader = imports.read_jsonl if import_format == 'jsonl' else imports.read_csv
+            progress = {'processed': 0, 'created': 0}
+            failed = 0
+            for progress in imports.import_tests(reader(imports.decode_lines(file)), user, options['chunk_size']):
+                for error in progress['errors']:
+                    message = f'Record at line {error["record"]}: {"; ".join(error["errors"])}'
+                    self.stderr.write(self.style.ERROR(message))
+                failed += len(progress['errors'])
+                self.stdout.write(f'  {progress["processed"]} processed, {progress["created"]} created')
+
+        self.stdout.write(self.style.SUCCESS(
+            f'Imported {progress["created"]} of {progress["processed"]} tests, {failed} invalid'
+        ))
@@ -0,0 +1,15 @@
+from django.core.management.base import BaseCommand
+
+from tests.utils import statistics
+
+
+class Command(BaseCommand):
+    help = ('Recompute per-test result statistics from the results table. '
+            'Pending increments of the rebuilt tests are discarded, so run it while tests are not being passed.')
+
+    def add_arguments(self, parser):
+        parser.add_argument('test_ids', nargs='*', type=int, help='Tests to rebuild, all tests by default')
+
+    def handle(self, *args, **options):
+        count = statistics.rebuild(options['test_ids'] or None)
+        self.stdout.write(self.style.SUCCESS(f'Rebuilt statistics of {count} tests'))
@@ -0,0 +1,144 @@
+import json
+
+from django.core.management.base import BaseCommand, CommandError
+from django.db import transaction
+from django.db.models import Count
+from django.test import Client, override_settings
+from django.urls import reverse
+
+from tests.forms import TestFormTree
+from tests.models import Test, Question
+from tests.utils import benchmarks, snapshots
+from tests.views import TestListView
+
+
+class Command(BaseCommand):
+    help = ('Time the hot paths in process against the current database (see generate_benchmark_data): '
+            'every filter and sort of the test list, passing a test and saving the question/answer '
+            'formsets. Records latency percentiles and query counts as JSON and reports regressions '
+            'against a baseline report. Writes are rolled back.')
+
+    def add_arguments(self, parser):
+        parser.add_argument('--repeat', type=int, default=20)
+        parser.add_argument('--output', default='benchmark-results.json')
+        parser.add_argument('--baseline', help='Report to compare with')
+        parser.add_argument('--only', help='Run the benchmarks whose name contains this text')
+
+    def get_large_test(self):
+        test_id = (Question.objects
+                   .values('test')
+                   .annotate(count=Count('pk'))
+                   .order_by('-count')
+                   .values_list('test', flat=True)
+                   .first())
+        if test_id is None:
+            raise CommandError('No tests with questions, run generate_benchmark_data first')
+        return Test.objects.select_related('user').get(pk=test_id)
+
+    @staticmethod
+    def get_form_data(*forms):
+        # The data a browser would post back for unchanged forms
+        data = {}
+        for form in forms:
+            for bound_field in form:
+                value = bound_field.value()
+                if value is not None:
+                    data[bound_field.html_name] = value
+        return data
+
+    def get_update_data(self, test):
+        form_tree = TestFormTree(instance=Test.objects.prefetch_related('questions__answers').get(pk=test.pk))
+        data = {'name': test.name, 'description': test.description or ''}
+        for formset in [form_tree.question_formset, *form_tree.answer_formsets]:
+            data.update(self.get_form_data(formset.management_form, *formset))
+        return data
+
+    @staticmethod
+    def get_create_data(question_count):
+        data = {
+            'name': f'Benchmark test with {question_count} questions',
+            'description': '',
+            'questions-TOTAL_FORMS': question_count,
+            'questions-INITIAL_FORMS': 0,
+        }
+        for index in range(question_count):
+            prefix = f'questions-{index}'
+            data[f'{prefix}-text'] = f'Question {index}'
+            data[f'{prefix}-answers-TOTAL_FORMS'] = 4
+            data[f'{prefix}-answers-INITIAL_FORMS'] = 0
+            for answer_index, letter in enumerate('ABCD'):
+                data[f'{prefix}-answers-{answer_index}-letter'] = letter
+                data[f'{prefix}-answers-{answer_index}-text'] = f'Answer {letter}'
+                data[f'{prefix}-answers-{answer_index}-is_correct'] = str(answer_index == 0)
+        return data
+
+    def get_benchmarks(self, client, test):
+        def request(method, url, data=None):
+            def run():
+                response = getattr(client, method)(url, data)
+                if response.status_code >= 400:
+                    raise CommandError(f'{method.upper()} {url} returned {response.status_code}')
+            return run
+
+        list_url = reverse('test_list')
+        items = {}
+        for field in TestListView.ordering_fields:
+            for order_by in (field, f'-{field}'):
+                items[f'test_list order_by={order_by}'] = request('get', list_url, {'order_by': order_by})
+        items.update({
+            'test_list search': request('get', list_url, {'search': 'python django'}),
+            'test_list passes range': request('get', list_url, {'passes_number_min': 10, 'passes_number_max': 500}),
+            'test_list my': request('get', list_url, {'list_type': 'my'}),
+            'test_list last page': request('get', list_url, {'cursor': 'last'}),
+            'test_detail': request('get', reverse('test_detail', args=[test.pk])),
+            'test_results': request('get', reverse('test_results')),
+            'test_pass GET': request('get', reverse('test_pass', args=[test.pk])),
+        })
+
+        snapshot = snapshots.get_snapshot(test.pk)
+        submission = {
+            f'question_{question.id}': question.answers[0].id
+            for question in snapshot.questions if question.answers
+        }
+        items[f'test_pass POST {len(snapshot.questions)} questions'] = request(
+            'post', reverse('test_pass', args=[test.pk]), submission,
+        )
+
+        for question_count in (10, 50, 100):
+            items[f'test_create POST {question_count} questions'] = request(
+                'post', reverse('test_create'), self.get_create_data(question_count),
+            )
+        items[f'test_update POST {len(snapshot.questions)} questions unchanged'] = request(
+            'post', reverse('test_update', args=[test.pk]), self.get_update_data(test),
+        )
+        return items
+
+    @override_settings(ALLOWED_HOSTS=['testserver'])
+    def handle(self, *args, **options):
+        test = self.get_large_test()
+        client = Client()
+        client.force_login(test.user)
+
+        results = {}
+        with transaction.atomic():
+            for name, func in self.get_benchmarks(client, test).items():
+                if options['only'] and options['only'] not in name:
+                    continue
+                results[name] = benchmarks.measure(func, repeat=options['repeat'])
+                result = results[name]
+                self.stdout.write(
+                    f'{name:<50}{result["p50_ms"]:>10.2f} ms p50{result["p99_ms"]:>10.2f} ms p99'
+                    f'{result["queries"]:>6} queries'
+                )
+            transaction.set_rollback(True)
+
+        report = benchmarks.write_report(options['output'], 'micro', results)
+        self.stdout.write(self.style.SUCCESS(f'Wrote {options["output"]}'))
+
+        if options['baseline']:
+            with open(options['baseline']) as file:
+                regressions = benchmarks.compare_reports(json.load(file), report)
+            for line in regressions:
+                self.stdout.write(self.style.WARNING(f'Regression: {line}'))
+            if regressions:
+                raise CommandError(f'{len(regressions)} regressions against {options["baseline"]}')
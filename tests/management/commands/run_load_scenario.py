@@ -0,0 +1,160 @@
+import random
+import threading
+import time
+from urllib.parse import urljoin
+
+import requests
+from django.conf import settings
+from django.contrib.auth import BACKEND_SESSION_KEY, HASH_SESSION_KEY, SESSION_KEY, get_user_model
+from django.contrib.sessions.backends.db import SessionStore
+from django.core.management.base import BaseCommand, CommandError
+from django.urls import reverse
+from django.utils.crypto import get_random_string
+
+from tests.models import Test
+from tests.utils import benchmarks, snapshots
+from tests.views import TestListView
+
+
+User = get_user_model()
+
+
+class VirtualUser:
+    """
+    Walks the browse -> detail -> pass -> result flow against a running server
+    with think time between the steps, like a locust user.
+    """
+
+    def __init__(self, base_url, session_key, tests, think_time, random_generator):
+        self.base_url = base_url
+        self.tests = tests
+        self.think_time = think_time
+        self.random = random_generator
+        self.csrf_token = get_random_string(32)
+        self.session = requests.Session()
+        # Set without the Secure flag of the production cookies, so they travel over plain HTTP
+        self.session.cookies.set(settings.SESSION_COOKIE_NAME, session_key)
+        self.session.cookies.set(settings.CSRF_COOKIE_NAME, self.csrf_token)
+
+    def request(self, step, method, path, record, **kwargs):
+        start = time.perf_counter()
+        try:
+            response = self.session.request(method, urljoin(self.base_url, path), allow_redirects=False,
+                                            timeout=30, **kwargs)
+            failed = response.status_code >= 400
+        except requests.RequestException:
+            response, failed = None, True
+        record(step, time.perf_counter() - start, failed)
+        return response
+
+    def run_flow(self, record):
+        order_by = self.random.choice(TestListView.ordering_fields)
+        self.request('browse', 'GET', reverse('test_list'), record, params={'order_by': order_by})
+        self.think()
+
+        test_id, questions = self.random.choice(self.tests)
+        self.request('detail', 'GET', reverse('test_detail', args=[test_id]), record)
+        self.think()
+
+        self.request('pass GET', 'GET', reverse('test_pass', args=[test_id]), record)
+        self.think()
+        data = {
+            f'question_{question_id}': self.random.choice(answer_ids)
+            for question_id, answer_ids in questions
+        }
+        data['csrfmiddlewaretoken'] = self.csrf_token
+        response = self.request('pass POST', 'POST', reverse('test_pass', args=[test_id]), record, data=data,
+                                headers={'Referer': self.base_url})
+        if response is not None and response.is_redirect:
+            self.request('result', 'GET', response.headers['Location'], record)
+        self.think()
+
+    def think(self):
+        if self.think_time:
+            time.sleep(self.random.uniform(0, self.think_time))
+
+
+class Command(BaseCommand):
+    help = ('Run concurrent virtual users through the browse -> pass -> result flow against a running '
+            'server sharing this database (for sessions and test data) and record per-step latency '
+            'percentiles as JSON. Uses the users created by generate_benchmark_data and creates results.')
+
+    def add_arguments(self, parser):
+        parser.add_argument('--base-url', default='http://localhost:8000')
+        parser.add_argument('--users', type=int, default=20, help='Concurrent virtual users')
+        parser.add_argument('--duration', type=float, default=60.0, help='Seconds')
+        parser.add_argument('--think-time', type=float, default=1.0, help='Maximum pause between steps, seconds')
+        parser.add_argument('--sample-tests', type=int, default=200)
+        parser.add_argument('--seed', type=int, default=0)
+        parser.add_argument('--output', default='load-results.json')
+
+    def create_session(self, user):
+        session = SessionStore()
+        session[SESSION_KEY] = str(user.pk)
+        session[BACKEND_SESSION_KEY] = 'django.contrib.auth.backends.ModelBackend'
+        session[HASH_SESSION_KEY] = user.get_session_auth_hash()
+        session.create()
+        return session.session_key
+
+    def get_tests(self, count):
+        tests = []
+        for test_id in Test.objects.order_by('?').values_list('pk', flat=True)[:count]:
+            snapshot = snapshots.get_snapshot(test_id)
+            questions = [
+                (question.id, [answer.id for answer in question.answers])
+                for question in snapshot.questions if question.answers
+            ]
+            if questions:
+                tests.append((test_id, questions))
+        return tests
+
+    def handle(self, *args, **options):
+        generator = random.Random(options['seed'])
+        users = list(User.objects.filter(username__startswith=benchmarks.BENCHMARK_USERNAME_PREFIX)[:options['users']])
+        tests = self.get_tests(options['sample_tests'])
+        if not users or not tests:
+            raise CommandError('No benchmark users or tests, run generate_benchmark_data first')
+
+        latencies, errors, flows = {}, {}, [0]
+        lock = threading.Lock()
+
+        def record(step, elapsed, failed):
+            with lock:
+                latencies.setdefault(step, [])
+                errors.setdefault(step, 0)
+                if failed:
+                    errors[step] += 1
+                else:
+                    latencies[step].append(elapsed)
+
+        virtual_users = [
+            VirtualUser(
+                options['base_url'], self.create_session(users[index % len(users)]), tests, options['think_time'],
+                random.Random(generator.random()),
+            )
+            for index in range(options['users'])
+        ]
+        deadline = time.monotonic() + options['duration']
+
+        def run(virtual_user):
+            while time.monotonic() < deadline:
+                virtual_user.run_flow(record)
+                with lock:
+                    flows[0] += 1
+
+        threads = [threading.Thread(target=run, args=[virtual_user]) for virtual_user in virtual_users]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+
+        results = {
+            step: {**benchmarks.summarize(step_latencies), 'errors': errors[step]}
+            for step, step_latencies in latencies.items()
+        }
+        results['flow'] = {'count': flows[0], 'per_second': round(flows[0] / options['duration'], 2)}
+        benchmarks.write_report(options['output'], 'load', results)
+
+        for step, result in results.items():
+            self.stdout.write(f'{step:<12}{result}')
+        self.stdout.write(self.style.SUCCESS(f'Wrote {options["output"]}'))
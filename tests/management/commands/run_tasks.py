@@ -0,0 +1,66 @@
+import os
+import signal
+import socket
+import time
+import uuid
+
+from django.core.management.base import BaseCommand
+from django.utils.module_loading import autodiscover_modules
+
+from tests.utils import counters, tasks
+
+
+class Command(BaseCommand):
+    help = ('Run queued background tasks (see tests.utils.tasks) until stopped, applying pending '
+            'counter increments on the way. Any number of workers can run side by side.')
+
+    def add_arguments(self, parser):
+        parser.add_argument('--batch-size', type=int, default=20, help='Tasks claimed at a time')
+        parser.add_argument('--lease', type=int, default=300,
+                            help='Seconds before tasks of a dead worker are taken over')
+        parser.add_argument('--poll-interval', type=float, default=1, help='Seconds between polls of an empty queue')
+        parser.add_argument('--flush-interval', type=float, default=10,
+                            help='Seconds between flushes of the counter increments, 0 to leave them to flush_counters')
+        parser.add_argument('--burst', action='store_true', help='Exit once the queue is empty')
+
+    def handle(self, *args, **options):
+        autodiscover_modules('tasks')
+        worker = f'{socket.gethostname()}:{os.getpid()}:{uuid.uuid4().hex[:8]}'
+        self.stopping = False
+        signal.signal(signal.SIGTERM, self.stop)
+        signal.signal(signal.SIGINT, self.stop)
+
+        self.stdout.write(f'Worker {worker} started')
+        next_flush = 0
+        while not self.stopping:
+            if options['flush_interval'] and time.monotonic() >= next_flush:
+                self.flush_counters()
+                next_flush = time.monotonic() + options['flush_interval']
+            claimed = tasks.claim(worker, options['batch_size'], options['lease'])
+            if not claimed:
+                if options['burst']:
+                    if options['flush_interval']:
+                        self.flush_counters()
+                    break
+                time.sleep(options['poll_interval'])
+                continue
+            for task in claimed:
+                # Unstarted tasks of the batch are taken over once their lease expires
+                if self.stopping:
+                    break
+                outcome = tasks.execute(task, worker)
+                style = self.style.SUCCESS if outcome == 'done' else self.style.WARNING
+                self.stdout.write(style(f'{task.name} #{task.pk}: {outcome}'))
+        self.stdout.write(f'Worker {worker} stopped')
+
+    def flush_counters(self):
+        # Concurrent flushes skip each other's rows, so every worker can do it
+        applied = 0
+        while batch := counters.flush():
+            applied += batch
+        if applied:
+            self.stdout.write(f'Applied {applied} counter increments')
+
+    def stop(self, signum, frame):
+        # Finish the running task first
+        self.stopping = True
@@ -0,0 +1,214 @@
+import cProfile
+import io
+import logging
+import marshal
+import pstats
+import threading
+import time
+
+from asgiref.sync import iscoroutinefunction, markcoroutinefunction, sync_to_async
+from django.conf import settings
+from django.core.exceptions import MiddlewareNotUsed
+from django.urls import reverse
+
+from tests.models import ProfileTrace
+from tests.utils import metrics
+from tests.utils.queries import QueryBudgetExceeded, QueryRecorder
+
+
+logger = logging.getLogger(__name__)
+
+_profiling_lock = threading.Lock()
+
+
+class QueryBudgetMiddleware:
+    """
+    Records the queries of every request, reports them in the Server-Timing header and
+    checks them against the budget of the URL name in settings.QUERY_BUDGETS, either a
+    number or a number per method. QUERY_BUDGET_MODE tells what happens when a view goes
+    over its budget: `warn` logs the repeated queries, `raise` fails the request, `off`
+    disables the middleware. Queries of streamed response bodies are not seen.
+    """
+
+    sync_capable = True
+    async_capable = True
+
+    def __init__(self, get_response):
+        if settings.QUERY_BUDGET_MODE == 'off':
+            raise MiddlewareNotUsed
+        self.get_response = get_response
+        if iscoroutinefunction(self.get_response):
+            markcoroutinefunction(self)
+
+    @staticmethod
+    def get_budget(request):
+        if request.resolver_match is None:
+            return None
+        budget = settings.QUERY_BUDGETS.get(request.resolver_match.view_name)
+        if isinstance(budget, dict):
+            budget = budget.get(request.method)
+        return budget
+
+    def __call__(self, request):
+        if iscoroutinefunction(self):
+            return self.__acall__(request)
+        recorder = QueryRecorder()
+        start = time.perf_counter()
+        with recorder.record():
+            response = self.get_response(request)
+        return self.process_response(request, response, recorder, time.perf_counter() - start)
+
+    async def __acall__(self, request):
+        recorder = QueryRecorder()
+        start = time.perf_counter()
+        with recorder.record():
+            response = await self.get_response(request)
+        return self.process_response(request, response, recorder, time.perf_counter() - start)
+
+    def process_response(self, request, response, recorder, duration):
+        response['Server-Timing'] = (
+            f'db;dur={recorder.duration * 1000:.1f};desc="{recorder.count} queries", '
+            f'total;dur={duration * 1000:.1f}'
+        )
+
+        view_name = request.resolver_match.view_name if request.resolver_match else 'unresolved'
+        metrics.increment('http_requests_total', view=view_name, method=request.method)
+        metrics.increment('http_request_queries_total', recorder.count, view=view_name, method=request.method)
+        metrics.observe('http_request_seconds', duration, view=view_name, method=request.method)
+
+        budget = self.get_budget(request)
+        if budget is not None and recorder.count > budget:
+            metrics.increment('http_query_budget_exceeded_total', view=view_name, method=request.method)
+            description = recorder.describe(f'{request.method} {view_name}', budget)
+            if settings.QUERY_BUDGET_MODE == 'raise':
+                raise QueryBudgetExceeded(description)
+            logger.warning(description)
+        return response
+
+
+class StageTimingMiddleware:
+    """
+    Times the rendering of template responses into the `stage_seconds` metric.
+    """
+
+    sync_capable = True
+    async_capable = True
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+        if iscoroutinefunction(self.get_response):
+            markcoroutinefunction(self)
+
+    def __call__(self, request):
+        if iscoroutinefunction(self):
+            return self.__acall__(request)
+        return self.get_response(request)
+
+    async def __acall__(self, request):
+        return await self.get_response(request)
+
+    def process_template_response(self, request, response):
+        # Views rendering early (QuerySetShapeMixin in strict mode) time themselves
+        if response.is_rendered:
+            return response
+        start = time.perf_counter()
+        view_name = request.resolver_match.view_name
+
+        def observe(response):
+            metrics.observe('stage_seconds', time.perf_counter() - start, stage='template_render', view=view_name)
+
+        response.add_post_render_callback(observe)
+        return response
+
+
+class ProfilingMiddleware:
+    """
+    Profiles a request with cProfile when a staff user asks for it with the `X-Profile`
+    header or the `_profile` query parameter. The trace covers the view, template rendering
+    and SQL and is stored as a ProfileTrace, downloadable from the admin (its URL is returned
+    in the `X-Profile-Trace` header). Enabled with PROFILING_ENABLED, must come after
+    AuthenticationMiddleware.
+
+    Only one request per process is profiled at a time, others asking for it meanwhile
+    are served unprofiled: since Python 3.12 cProfile allows one active profiler per
+    interpreter. That profiler sees every thread, so a trace may include the work of
+    requests served concurrently by other threads. Before 3.12 only the thread that
+    enabled it is profiled, under ASGI the parts of a view run in other threads are not.
+    """
+
+    keep_queries = 500
+    report_lines = 80
+    sync_capable = True
+    async_capable = True
+
+    def __init__(self, get_response):
+        if not settings.PROFILING_ENABLED:
+            raise MiddlewareNotUsed
+        self.get_response = get_response
+        if iscoroutinefunction(self.get_response):
+            markcoroutinefunction(self)
+
+    @staticmethod
+    def is_requested(request):
+        return bool(request.headers.get('X-Profile') or '_profile' in request.GET)
+
+    def __call__(self, request):
+        if iscoroutinefunction(self):
+            return self.__acall__(request)
+        if not (self.is_requested(request) and request.user.is_staff):
+            return self.get_response(request)
+        if not _profiling_lock.acquire(blocking=False):
+            return self.get_response(request)
+
+        recorder = QueryRecorder(keep_queries=self.keep_queries)
+        profiler = cProfile.Profile()
+        start = time.perf_counter()
+        try:
+            with recorder.record():
+                profiler.enable()
+                try:
+                    response = self.get_response(request)
+                finally:
+                    profiler.disable()
+        finally:
+            _profiling_lock.release()
+        return self.save_trace(request, response, recorder, profiler, time.perf_counter() - start)
+
+    async def __acall__(self, request):
+        if not (self.is_requested(request) and (await request.auser()).is_staff):
+            return await self.get_response(request)
+        if not _profiling_lock.acquire(blocking=False):
+            return await self.get_response(request)
+
+        recorder = QueryRecorder(keep_queries=self.keep_queries)
+        profiler = cProfile.Profile()
+        start = time.perf_counter()
+        try:
+            with recorder.record():
+                profiler.enable()
+                try:
+                    response = await self.get_response(request)
+                finally:
+                    profiler.disable()
+        finally:
+            _profiling_lock.release()
+        return await sync_to_async(self.save_trace)(request, response, recorder, profiler, time.perf_counter() - start)
+
+    def save_trace(self, request, response, recorder, profiler, duration):
+        stream = io.StringIO()
+        stats = pstats.Stats(profiler, stream=stream)
+        stats.sort_stats(pstats.SortKey.CUMULATIVE).print_stats(self.report_lines)
+        trace = ProfileTrace.objects.create(
+            user=request.user,
+            method=request.method,
+            path=request.get_full_path()[:2048],
+            view_name=request.resolver_match.view_name if request.resolver_match else '',
+            status_code=response.status_code,
+            duration=duration,
+            query_count=recorder.count,
+            queries=recorder.queries,
+            report=stream.getvalue(),
+            stats=marshal.dumps(stats.stats),
+        )
+        response['X-Profile-Trace'] = reverse('admin:tests_profiletrace_change', args=[trace.pk])
+        return response
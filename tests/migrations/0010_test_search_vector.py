@@ -0,0 +1,54 @@
+# Generated by Django 5.0.7 on 2026-10-18 16:10
+
+import django.contrib.postgres.indexes
+import django.contrib.postgres.search
+from django.db import migrations
+
+
+# Full-text search only exists on PostgreSQL; other backends (SQLite in development)
+# keep an unused column and search with LIKE instead, see tests.utils.search.
+
+def create_search_index(apps, schema_editor):
+    if schema_editor.connection.vendor != 'postgresql':
+        return
+    schema_editor.execute('CREATE INDEX tests_test_search_gin ON tests_test USING gin (search_vector)')
+    schema_editor.execute("""
+        UPDATE tests_test SET search_vector =
+            setweight(to_tsvector('english', coalesce(name, '')), 'A')
+            || setweight(to_tsvector('english', coalesce(description, '')), 'B')
+            || setweight(to_tsvector('english', coalesce(
+                (SELECT string_agg(text, ' ') FROM tests_question WHERE test_id = tests_test.id), ''
+            )), 'C')
+    """)
+
+
+def drop_search_index(apps, schema_editor):
+    if schema_editor.connection.vendor != 'postgresql':
+        return
+    schema_editor.execute('DROP INDEX IF EXISTS tests_test_search_gin')
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('tests', '0009_counterincrement'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='test',
+            name='search_vector',
+            field=django.contrib.postgres.search.SearchVectorField(editable=False, null=True),
+        ),
+        migrations.SeparateDatabaseAndState(
+            state_operations=[
+                migrations.AddIndex(
+                    model_name='test',
+                    index=django.contrib.postgres.indexes.GinIndex(fields=['search_vector'], name='tests_test_search_gin'),
+                ),
+            ],
+            database_operations=[
+                migrations.RunPython(create_search_index, drop_search_index),
+            ],
+        ),
+    ]
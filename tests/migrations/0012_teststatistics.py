@@ -0,0 +1,55 @@
+# Generated by Django 5.0.7 on 2026-10-18 16:09
+
+import django.db.models.deletion
+from django.db import migrations, models
+from django.db.models import Count
+
+
+SCORE_BUCKETS = [(0, 'scores_0_19'), (20, 'scores_20_39'), (40, 'scores_40_59'), (60, 'scores_60_79'),
+                 (80, 'scores_80_100')]
+
+
+def populate_statistics(apps, schema_editor):
+    Test = apps.get_model('tests', 'Test')
+    Result = apps.get_model('tests', 'Result')
+    TestStatistics = apps.get_model('tests', 'TestStatistics')
+
+    statistics = {test_id: TestStatistics(test_id=test_id) for test_id in Test.objects.values_list('pk', flat=True)}
+    rows = Result.objects.values_list('test_id', 'score', 'question_count').annotate(count=Count('pk')).order_by()
+    for test_id, score, question_count, count in rows:
+        item = statistics[test_id]
+        item.result_count += count
+        item.score_sum += score * count
+        item.question_sum += question_count * count
+        percent = score * 100 / question_count if question_count else 0
+        field = [field for lower, field in SCORE_BUCKETS if percent >= lower][-1]
+        setattr(item, field, getattr(item, field) + count)
+    TestStatistics.objects.bulk_create(statistics.values(), batch_size=1000)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('tests', '0011_list_indexes'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='TestStatistics',
+            fields=[
+                ('test', models.OneToOneField(on_delete=django.db.models.deletion.CASCADE, primary_key=True, related_name='statistics', serialize=False, to='tests.test')),
+                ('result_count', models.PositiveIntegerField(default=0)),
+                ('score_sum', models.PositiveBigIntegerField(default=0)),
+                ('question_sum', models.PositiveBigIntegerField(default=0)),
+                ('scores_0_19', models.PositiveIntegerField(default=0)),
+                ('scores_20_39', models.PositiveIntegerField(default=0)),
+                ('scores_40_59', models.PositiveIntegerField(default=0)),
+                ('scores_60_79', models.PositiveIntegerField(default=0)),
+                ('scores_80_100', models.PositiveIntegerField(default=0)),
+            ],
+            options={
+                'verbose_name_plural': 'test statistics',
+            },
+        ),
+        migrations.RunPython(populate_statistics, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,32 @@
+# Generated by Django 5.0.7 on 2026-10-18 16:12
+
+from django.db import migrations, models
+from django.db.models import Count, OuterRef, Subquery
+from django.db.models.functions import Coalesce
+
+
+def count_comments(apps, schema_editor):
+    Test = apps.get_model('tests', 'Test')
+    Comment = apps.get_model('tests', 'Comment')
+    comment_count = (Comment.objects
+                     .filter(test=OuterRef('pk'))
+                     .values('test')
+                     .annotate(count=Count('pk'))
+                     .values('count'))
+    Test.objects.update(comment_count=Coalesce(Subquery(comment_count), 0))
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('tests', '0012_teststatistics'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='test',
+            name='comment_count',
+            field=models.PositiveIntegerField(default=0),
+        ),
+        migrations.RunPython(count_comments, migrations.RunPython.noop),
+    ]
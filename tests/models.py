@@ -1,5 +1,7 @@
 from django.db import models
 from django.contrib.auth import get_user_model
+from django.contrib.postgres.indexes import GinIndex
+from django.contrib.postgres.search import SearchVectorField
 
 
 User = get_user_model()
@@ -10,9 +12,21 @@ class Test(models.Model):
     name = models.CharField(max_length=255)
     description = models.TextField(null=True, blank=True)
     passes_number = models.PositiveIntegerField(default=0)
+    comment_count = models.PositiveIntegerField(default=0)
+    search_vector = SearchVectorField(null=True, editable=False)
     created_at = models.DateTimeField(auto_now_add=True)
     updated_at = models.DateTimeField(auto_now=True)
 
+    class Meta:
+        indexes = [
+            GinIndex(fields=['search_vector'], name='tests_test_search_gin'),
+            # Sort and filter surface of TestListView, pk is the cursor tie-breaker
+            models.Index(fields=['-created_at', '-id'], name='tests_test_created_idx'),
+            models.Index(fields=['passes_number', 'id'], name='tests_test_passes_idx'),
+            models.Index(fields=['name', 'id'], name='tests_test_name_idx'),
+            models.Index(fields=['user', '-created_at', '-id'], name='tests_test_user_created_idx'),
+        ]
+
     def __str__(self):
         return self.name
 
@@ -61,6 +75,11 @@ class Result(models.Model):
     created_at = models.DateTimeField(auto_now_add=True)
     updated_at = models.DateTimeField(auto_now=True)
 
+    class Meta:
+        indexes = [
+            models.Index(fields=['user', '-created_at', '-id'], name='tests_result_user_created_idx'),
+        ]
+
     def __str__(self):
         return f'{self.user} - {self.test} - {self.score}'
 
@@ -72,5 +91,149 @@ class Comment(models.Model):
     created_at = models.DateTimeField(auto_now_add=True)
     updated_at = models.DateTimeField(auto_now=True)
 
+    class Meta:
+        indexes = [
+            models.Index(fields=['test', '-created_at', '-id'], name='tests_comment_test_created_idx'),
+        ]
+
     def __str__(self):
         return self.text
+
+
+class CounterIncrement(models.Model):
+    """
+    Pending delta of a counter column (e.g. Test.passes_number).
+    Increments are appended here instead of updating the hot row
+    and are applied in batches by the `run_tasks` worker or the `flush_counters` command.
+    """
+
+    content_type = models.ForeignKey('contenttypes.ContentType', on_delete=models.CASCADE)
+    object_id = models.PositiveBigIntegerField()
+    field = models.CharField(max_length=64)
+    delta = models.IntegerField(default=1)
+    created_at = models.DateTimeField(auto_now_add=True)
+
+    def __str__(self):
+        return f'{self.content_type} #{self.object_id} {self.field} {self.delta:+d}'
+
+
+class TestStatistics(models.Model):
+    """
+    Aggregates of the results of a test. Kept up to date incrementally through
+    the counter log (see tests.utils.statistics) and rebuilt by `rebuild_test_statistics`.
+    """
+
+    # Lower bound of the score percentage of each histogram bucket and its field
+    SCORE_BUCKETS = [
+        (0, 'scores_0_19'),
+        (20, 'scores_20_39'),
+        (40, 'scores_40_59'),
+        (60, 'scores_60_79'),
+        (80, 'scores_80_100'),
+    ]
+    PASS_PERCENT = 60
+
+    test = models.OneToOneField(Test, on_delete=models.CASCADE, primary_key=True, related_name='statistics')
+    result_count = models.PositiveIntegerField(default=0)
+    score_sum = models.PositiveBigIntegerField(default=0)
+    question_sum = models.PositiveBigIntegerField(default=0)
+    scores_0_19 = models.PositiveIntegerField(default=0)
+    scores_20_39 = models.PositiveIntegerField(default=0)
+    scores_40_59 = models.PositiveIntegerField(default=0)
+    scores_60_79 = models.PositiveIntegerField(default=0)
+    scores_80_100 = models.PositiveIntegerField(default=0)
+
+    class Meta:
+        verbose_name_plural = 'test statistics'
+
+    def __str__(self):
+        return f'{self.test_id} - {self.result_count} results'
+
+    @classmethod
+    def get_bucket_field(cls, score, question_count):
+        percent = score * 100 / question_count if question_count else 0
+        return [field for lower, field in cls.SCORE_BUCKETS if percent >= lower][-1]
+
+    @property
+    def average_percent(self):
+        if not self.question_sum:
+            return None
+        return self.score_sum * 100 / self.question_sum
+
+    @property
+    def pass_rate(self):
+        if not self.result_count:
+            return None
+        passed = sum(getattr(self, field) for lower, field in self.SCORE_BUCKETS if lower >= self.PASS_PERCENT)
+        return passed * 100 / self.result_count
+
+    @property
+    def histogram(self):
+        bounds = [lower for lower, _ in self.SCORE_BUCKETS] + [101]
+        return [
+            {
+                'label': f'{lower}-{bounds[index + 1] - 1}%',
+                'count': getattr(self, field),
+                'percent': getattr(self, field) * 100 / self.result_count if self.result_count else 0,
+            }
+            for index, (lower, field) in enumerate(self.SCORE_BUCKETS)
+        ]
+
+
+class ProfileTrace(models.Model):
+    """
+    cProfile trace of a request, captured on demand by tests.middleware.ProfilingMiddleware.
+    """
+
+    user = models.ForeignKey(User, on_delete=models.SET_NULL, null=True, related_name='+')
+    method = models.CharField(max_length=10)
+    path = models.CharField(max_length=2048)
+    view_name = models.CharField(max_length=255, blank=True)
+    status_code = models.PositiveSmallIntegerField()
+    duration = models.FloatField(help_text='Seconds')
+    query_count = models.PositiveIntegerField()
+    queries = models.JSONField(default=list)
+    report = models.TextField()
+    # pstats dump, readable with pstats.Stats or snakeviz
+    stats = models.BinaryField()
+    created_at = models.DateTimeField(auto_now_add=True)
+
+    def __str__(self):
+        return f'{self.method} {self.path} ({self.duration * 1000:.0f} ms)'
+
+
+class Task(models.Model):
+    """
+    Queued background work, run by the `run_tasks` worker (see tests.utils.tasks).
+    Finished tasks are deleted, tasks failing every attempt are kept as failed.
+    """
+
+    PENDING = 'pending'
+    RUNNING = 'running'
+    FAILED = 'failed'
+    STATUSES = [
+        (PENDING, 'Pending'),
+        (RUNNING, 'Running'),
+        (FAILED, 'Failed'),
+    ]
+
+    name = models.CharField(max_length=255)
+    payload = models.JSONField(default=dict)
+    status = models.CharField(max_length=10, choices=STATUSES, default=PENDING)
+    attempts = models.PositiveSmallIntegerField(default=0)
+    max_attempts = models.PositiveSmallIntegerField(default=5)
+    run_at = models.DateTimeField()
+    # Worker running the task and until when, after which another worker takes it over
+    locked_by = models.CharField(max_length=255, blank=True)
+    locked_until = models.DateTimeField(null=True, blank=True)
+    last_error = models.TextField(blank=True)
+    created_at = models.DateTimeField(auto_now_add=True)
+    updated_at = models.DateTimeField(auto_now=True)
+
+    class Meta:
+        indexes = [
+            models.Index(fields=['status', 'run_at'], name='tests_task_status_run_at_idx'),
+        ]
+
+    def __str__(self):
+        return f'{self.name} #{self.pk} ({self.status})'
@@ -0,0 +1,135 @@
+from django.core.exceptions import ObjectDoesNotExist
+from rest_framework.exceptions import ValidationError
+
+from tests.models import TestStatistics
+
+
+def make_getter(path):
+    attributes = path.split('.')
+
+    def get(obj):
+        try:
+            for attribute in attributes:
+                if obj is None:
+                    return None
+                obj = getattr(obj, attribute)
+        except ObjectDoesNotExist:
+            return None
+        return obj
+
+    return get
+
+
+class ReadSerializer:
+    """
+    Flat read-only serializer for the hot API endpoints. Attributes are read with
+    getters built once per request rather than with ModelSerializer's field classes
+    for every row, and querysets load only the columns of the fields asked for with
+    `?fields=` (sparse fieldsets).
+    """
+
+    # {output name: attribute path, dotted through relations}
+    fields = {}
+    # {output name: columns to load} when they differ from the attribute path
+    columns = {}
+
+    def __init__(self, names=None):
+        if names:
+            unknown = [name for name in names if name not in self.fields]
+            if unknown:
+                raise ValidationError({'fields': [
+                    f'Unknown fields: {", ".join(unknown)}. Available: {", ".join(self.fields)}.',
+                ]})
+        self.names = list(dict.fromkeys(names)) if names else list(self.fields)
+        self.getters = [(name, make_getter(self.fields[name])) for name in self.names]
+
+    def get_columns(self):
+        columns = []
+        for name in self.names:
+            columns += self.columns.get(name, [self.fields[name].replace('.', '__')])
+        return columns
+
+    def shape_queryset(self, queryset, *columns):
+        """
+        Load only the columns of the serialized fields and `columns` (e.g. the
+        ordering of a cursor), joining the relations they go through.
+        """
+        columns = ['pk', *self.get_columns(), *columns]
+        relations = {column.rsplit('__', 1)[0] for column in columns if '__' in column}
+        if relations:
+            queryset = queryset.select_related(*relations)
+        return queryset.only(*columns)
+
+    def to_representation(self, obj):
+        return {name: get(obj) for name, get in self.getters}
+
+    def serialize(self, objects):
+        return [self.to_representation(obj) for obj in objects]
+
+
+class TestSerializer(ReadSerializer):
+    fields = {
+        'id': 'pk',
+        'name': 'name',
+        'description': 'description',
+        'author': 'user.username',
+        'passes_number': 'passes_number',
+        'comment_count': 'comment_count',
+        'created_at': 'created_at',
+        'updated_at': 'updated_at',
+    }
+    columns = {
+        'id': [],
+    }
+
+
+class TestDetailSerializer(TestSerializer):
+    fields = {
+        **TestSerializer.fields,
+        'result_count': 'statistics.result_count',
+        'average_percent': 'statistics.average_percent',
+        'pass_rate': 'statistics.pass_rate',
+    }
+    columns = {
+        **TestSerializer.columns,
+        'average_percent': ['statistics__score_sum', 'statistics__question_sum'],
+        'pass_rate': ['statistics__result_count'] + [
+            f'statistics__{field}' for lower, field in TestStatistics.SCORE_BUCKETS
+            if lower >= TestStatistics.PASS_PERCENT
+        ],
+    }
+
+
+class ResultSerializer(ReadSerializer):
+    fields = {
+        'id': 'pk',
+        'test': 'test_id',
+        'test_name': 'test.name',
+        'score': 'score',
+        'question_count': 'question_count',
+        'created_at': 'created_at',
+    }
+    columns = {
+        'id': [],
+        'test': ['test'],
+    }
+
+
+def serialize_snapshot(snapshot):
+    """
+    Questions of a test as shown to the user passing it, without the answer key.
+    """
+    return {
+        'id': snapshot.test_id,
+        'questions': [
+            {
+                'id': question.id,
+                'text': question.text,
+                'answers': [
+                    {'id': answer.id, 'letter': answer.letter, 'text': answer.text}
+                    for answer in question.answers
+                ],
+            }
+            for question in snapshot.questions
+        ],
+    }
@@ -0,0 +1,78 @@
+from django.contrib.auth import get_user_model
+from django.db.backends.signals import connection_created
+from django.db.models import QuerySet
+from django.db.models.signals import post_save, post_delete
+from django.dispatch import receiver
+
+from tests.models import Test, Question, Answer, Result, Comment, TestStatistics
+from tests.utils import caching, counters, metrics, queries
+from tests.utils.snapshots import invalidate_snapshot
+
+
+User = get_user_model()
+
+
+@receiver(post_save, sender=Test)
+def create_test_statistics(sender, instance, created, **kwargs):
+    if created:
+        TestStatistics.objects.create(test=instance)
+
+
+@receiver([post_save, post_delete], sender=Test)
+def invalidate_test(sender, instance, **kwargs):
+    caching.invalidate_on_commit(Test)
+    caching.invalidate_on_commit(Test, instance.pk)
+    invalidate_snapshot(instance.pk)
+
+
+@receiver([post_save, post_delete], sender=Question)
+def invalidate_question(sender, instance, **kwargs):
+    caching.invalidate_on_commit(Test, instance.test_id)
+    invalidate_snapshot(instance.test_id)
+
+
+@receiver([post_save, post_delete], sender=Answer)
+def invalidate_answer(sender, instance, origin=None, **kwargs):
+    # Answers deleted along with their question or test are invalidated by it,
+    # so loading the question of every one of them is not needed
+    if not Answer.question.is_cached(instance) and origin is not None and not _is_answer(origin):
+        return
+    caching.invalidate_on_commit(Test, instance.question.test_id)
+    invalidate_snapshot(instance.question.test_id)
+
+
+def _is_answer(origin):
+    return (origin.model if isinstance(origin, QuerySet) else type(origin)) is Answer
+
+
+@receiver([post_save, post_delete], sender=Result)
+def invalidate_result(sender, instance, **kwargs):
+    caching.invalidate_on_commit(Result, instance.pk)
+    caching.invalidate_on_commit(User, instance.user_id)
+
+
+@receiver([post_save, post_delete], sender=Comment)
+def invalidate_comment(sender, instance, **kwargs):
+    caching.invalidate_on_commit(Test, instance.test_id)
+
+
+@receiver(post_save, sender=Comment)
+def count_created_comment(sender, instance, created, **kwargs):
+    if created:
+        counters.increment(Test(pk=instance.test_id), 'comment_count')
+
+
+@receiver(post_delete, sender=Comment)
+def count_deleted_comment(sender, instance, **kwargs):
+    counters.increment(Test(pk=instance.test_id), 'comment_count', -1)
+
+
+@receiver(connection_created)
+def count_connection(sender, connection, **kwargs):
+    # Without persistent connections or a pool this grows by one per request
+    metrics.increment('db_connections_created_total', alias=connection.alias)
+
+
+@receiver(connection_created)
+def install_query_recorder(sender, connection, **kwargs):
+    queries.install(connection)
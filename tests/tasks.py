@@ -0,0 +1,18 @@
+from tests.models import Test, Result
+from tests.utils import counters, statistics
+from tests.utils.tasks import task
+
+
+@task(name=statistics.RECORD_RESULT_TASK)
+def record_result(result_id):
+    """
+    Count a new result in the passes and statistics of its test.
+    """
+    result = Result.objects.filter(pk=result_id).only('test', 'score', 'question_count').first()
+    # Deleted in the meantime, with its test
+    if result is None:
+        return
+    counters.increment_bulk({
+        Test(pk=result.test_id): {'passes_number': 1},
+        **statistics.get_deltas([result]),
+    })
@@ -8,3 +8,13 @@ register = template.Library()
 def index(sequence, position):
     return sequence[position]
 
+
+@register.simple_tag(takes_context=True)
+def query_replace(context, **kwargs):
+    query = context['request'].GET.copy()
+    for key, value in kwargs.items():
+        if value:
+            query[key] = value
+        else:
+            query.pop(key, None)
+    return query.urlencode()
@@ -1,3 +1,755 @@
-from django.test import TestCase
+import asyncio
+import csv
+import io
+import json
+from datetime import timedelta
+from unittest import mock
 
-# Create your tests here.
+from django.conf import settings
+from django.http import Http404
+from django.contrib.auth import get_user_model
+from django.contrib.contenttypes.models import ContentType
+from django.core.cache import cache
+from django.core.files.uploadedfile import SimpleUploadedFile
+from django.core.management import call_command
+from django.db.models import Prefetch
+from django.test import TestCase, override_settings
+from django.urls import reverse
+from django.utils import timezone
+from django.utils.http import urlencode
+
+from tests.forms import TestForm, TestFormTree
+from tests.models import Test, Question, Answer, Result, Comment, CounterIncrement, Task, TestStatistics
+from tests.tasks import record_result
+from tests.utils import caching, counters, exports, statistics, tasks
+from tests.utils.grading import AnswerKey, InvalidSubmission
+from tests.utils.pagination import paginate_by_cursor
+from tests.utils.queries import query_budget
+
+
+User = get_user_model()
+
+
+def create_test(user, name='Sample test', question_count=5):
+    """
+    A test whose answer A is the correct one of every question.
+    """
+    test = Test.objects.create(user=user, name=name, description='About Python')
+    for index in range(question_count):
+        question = Question.objects.create(test=test, text=f'Question {index}')
+        for letter, _ in Answer.LETTERS:
+            Answer.objects.create(question=question, letter=letter, text=f'Answer {letter}', is_correct=letter == 'A')
+    return test
+
+
+def get_answers(test, correct=True):
+    """
+    {question id: answer id} of the correct or of wrong answers of `test`.
+    """
+    answers = Answer.objects.filter(question__test=test)
+    answers = answers.filter(letter='A') if correct else answers.filter(letter='B')
+    return dict(answers.values_list('question_id', 'pk'))
+
+
+def get_form_tree_data(test):
+    """
+    The data the test editor posts for `test` unchanged.
+    """
+    data = {'questions-TOTAL_FORMS': 0, 'questions-INITIAL_FORMS': 0}
+    for index, question in enumerate(test.questions.order_by('pk')):
+        prefix = f'questions-{index}'
+        data.update({
+            'questions-TOTAL_FORMS': index + 1,
+            'questions-INITIAL_FORMS': index + 1,
+            f'{prefix}-id': question.pk,
+            f'{prefix}-text': question.text,
+            f'{prefix}-answers-TOTAL_FORMS': 4,
+            f'{prefix}-answers-INITIAL_FORMS': 4,
+        })
+        for answer_index, answer in enumerate(question.answers.order_by('pk')):
+            answer_prefix = f'{prefix}-answers-{answer_index}'
+            data.update({
+                f'{answer_prefix}-id': answer.pk,
+                f'{answer_prefix}-letter': answer.letter,
+                f'{answer_prefix}-text': answer.text,
+                f'{answer_prefix}-is_correct': str(answer.is_correct),
+            })
+    return data
+
+
+@tasks.task(name='tests.tests.comment_and_fail', max_attempts=2)
+def comment_and_fail(test_id, user_id):
+    Comment.objects.create(test_id=test_id, user_id=user_id, text='Written before failing')
+    raise ValueError('Failed')
+
+
+def within_budget(view_name, method='GET'):
+    budget = settings.QUERY_BUDGETS[view_name]
+    if isinstance(budget, dict):
+        budget = budget[method]
+    return query_budget(budget, f'{method} {view_name}')
+
+
+class CacheTestCase(TestCase):
+
+    def setUp(self):
+        # Cached pages and snapshots would outlive the rolled back rows they were built from
+        cache.clear()
+
+
+class GradingTests(CacheTestCase):
+
+    def setUp(self):
+        super().setUp()
+        self.answer_key = AnswerKey.from_rows([
+            (1, 10, True), (1, 11, False),
+            (2, 20, False), (2, 21, True),
+            (3, 30, True), (3, 31, False),
+        ])
+
+    def test_grade(self):
+        grading = self.answer_key.grade({'question_1': '10', 'question_2': '20', 'question_3': ''})
+        self.assertEqual(grading.score, 1)
+        self.assertEqual(grading.question_count, 3)
+        self.assertEqual([grade.selected_answer_id for grade in grading.questions], [10, 20, None])
+
+    def test_unknown_questions_are_ignored(self):
+        grading = self.answer_key.grade({'question_1': '10', 'question_99': '10', 'other': 'x'})
+        self.assertEqual((grading.score, grading.question_count), (1, 3))
+
+    def test_answer_of_another_question(self):
+        with self.assertRaises(InvalidSubmission):
+            self.answer_key.grade({'question_1': '20'})
+
+    def test_invalid_answer(self):
+        with self.assertRaises(InvalidSubmission):
+            self.answer_key.grade({'question_1': 'A'})
+
+    def test_pass_test(self):
+        user = User.objects.create_user('alice', password='password')
+        test = create_test(user)
+        answers = get_answers(test)
+        answers[min(answers)] = get_answers(test, correct=False)[min(answers)]
+        self.client.force_login(user)
+
+        response = self.client.post(reverse('test_pass', args=[test.pk]), {
+            f'question_{question_id}': answer_id for question_id, answer_id in answers.items()
+        })
+        result = Result.objects.get()
+        self.assertRedirects(response, reverse('test_result', args=[result.pk]), fetch_redirect_response=False)
+        self.assertEqual((result.score, result.question_count), (4, 5))
+
+        other = create_test(user, 'Other test')
+        response = self.client.post(reverse('test_pass', args=[test.pk]), {
+            f'question_{min(answers)}': min(get_answers(other).values()),
+        })
+        self.assertEqual(response.status_code, 400)
+        self.assertEqual(Result.objects.count(), 1)
+
+
+class CounterTests(CacheTestCase):
+
+    def setUp(self):
+        super().setUp()
+        self.user = User.objects.create_user('alice', password='password')
+        self.tests = [create_test(self.user, 'First'), create_test(self.user, 'Second')]
+
+    def test_flush(self):
+        first, second = self.tests
+        counters.increment(first, 'passes_number')
+        counters.increment(first, 'passes_number')
+        counters.increment_bulk({first: {'comment_count': 3}, second: {'passes_number': 2, 'comment_count': 0}})
+        self.assertEqual(CounterIncrement.objects.count(), 4)
+        # Not applied until flushed
+        first.refresh_from_db()
+        self.assertEqual(first.passes_number, 0)
+
+        # One UPDATE per changed counter
+        with query_budget(5):
+            self.assertEqual(counters.flush(), 4)
+        first.refresh_from_db()
+        second.refresh_from_db()
+        self.assertEqual((first.passes_number, first.comment_count), (2, 3))
+        self.assertEqual((second.passes_number, second.comment_count), (2, 0))
+        self.assertFalse(CounterIncrement.objects.exists())
+        self.assertEqual(counters.flush(), 0)
+
+    def test_flush_in_batches(self):
+        for _ in range(5):
+            counters.increment(self.tests[0], 'passes_number')
+        self.assertEqual(counters.flush(batch_size=3), 3)
+        self.assertEqual(counters.flush(batch_size=3), 2)
+        self.tests[0].refresh_from_db()
+        self.assertEqual(self.tests[0].passes_number, 5)
+
+    def test_comment_count(self):
+        comment = Comment.objects.create(test=self.tests[0], user=self.user, text='Nice')
+        Comment.objects.create(test=self.tests[0], user=self.user, text='Hard')
+        comment.delete()
+        counters.flush()
+        self.tests[0].refresh_from_db()
+        self.assertEqual(self.tests[0].comment_count, 1)
+
+    def test_editing_keeps_counters(self):
+        test = Test.objects.get(pk=self.tests[0].pk)
+        counters.increment(test, 'passes_number')
+        counters.flush()
+        # Saved from the values read before the flush
+        form = TestForm({'name': 'Renamed', 'description': ''}, instance=test)
+        self.assertTrue(form.is_valid())
+        form.save()
+        test.refresh_from_db()
+        self.assertEqual((test.name, test.passes_number), ('Renamed', 1))
+
+
+class CursorPaginationTests(TestCase):
+
+    @classmethod
+    def setUpTestData(cls):
+        user = User.objects.create_user('alice', password='password')
+        # Repeated names are told apart by pk
+        for name in ['b', 'a', 'b', 'c', 'a', 'b', 'd']:
+            Test.objects.create(user=user, name=name)
+
+    def walk(self, queryset, page_size):
+        pages, cursor = [], None
+        while True:
+            page = paginate_by_cursor(queryset, page_size, cursor)
+            pages.append(page)
+            if not page.has_next():
+                return pages
+            cursor = page.next_cursor
+
+    def test_walk_forwards(self):
+        for ordering in ['name', '-name', '-created_at', 'pk']:
+            queryset = Test.objects.order_by(ordering)
+            pages = self.walk(queryset, 3)
+            expected = list(queryset.order_by(ordering, '-pk' if ordering.startswith('-') else 'pk'))
+            self.assertEqual([test for page in pages for test in page], expected, ordering)
+            self.assertEqual([len(page) for page in pages], [3, 3, 1])
+            self.assertFalse(pages[0].has_previous())
+
+    def test_walk_backwards(self):
+        queryset = Test.objects.order_by('name')
+        pages = self.walk(queryset, 3)
+        previous = paginate_by_cursor(queryset, 3, pages[2].previous_cursor)
+        self.assertEqual(list(previous), list(pages[1]))
+        first = paginate_by_cursor(queryset, 3, previous.previous_cursor)
+        self.assertEqual(list(first), list(pages[0]))
+        self.assertFalse(first.has_previous())
+        self.assertTrue(first.has_next())
+
+    def test_last_page(self):
+        queryset = Test.objects.order_by('name')
+        page = paginate_by_cursor(queryset, 3, 'last')
+        self.assertEqual([test.name for test in page], ['b', 'c', 'd'])
+        self.assertFalse(page.has_next())
+        self.assertTrue(page.has_previous())
+
+    def test_single_query(self):
+        with self.assertNumQueries(1):
+            page = paginate_by_cursor(Test.objects.order_by('name'), 3)
+        with self.assertNumQueries(1):
+            paginate_by_cursor(Test.objects.order_by('name'), 3, page.next_cursor)
+
+    def test_invalid_cursor(self):
+        for cursor in ['x', 'WyJ1cCIsMSwyXQ']:
+            with self.assertRaises(Http404):
+                paginate_by_cursor(Test.objects.order_by('name'), 3, cursor)
+
+
+class TestFormTreeTests(CacheTestCase):
+
+    def setUp(self):
+        super().setUp()
+        self.test = create_test(User.objects.create_user('alice', password='password'), question_count=6)
+
+    def get_test(self):
+        # Prefetched like in TestUpdateView
+        return Test.objects.prefetch_related(
+            Prefetch('questions', queryset=Question.objects.order_by('pk')),
+            Prefetch('questions__answers', queryset=Answer.objects.order_by('pk')),
+        ).get(pk=self.test.pk)
+
+    def test_save_changes(self):
+        data = get_form_tree_data(self.test)
+        untouched = Question.objects.get(pk=data['questions-2-id'])
+        data['questions-0-text'] = 'Changed question'
+        data['questions-1-answers-0-is_correct'] = 'False'
+        data['questions-1-answers-1-is_correct'] = 'True'
+        data['questions-5-DELETE'] = 'on'
+        data.update({
+            'questions-TOTAL_FORMS': 7,
+            'questions-6-text': 'New question',
+            'questions-6-answers-TOTAL_FORMS': 4,
+            'questions-6-answers-INITIAL_FORMS': 0,
+        })
+        for index, (letter, _) in enumerate(Answer.LETTERS):
+            data.update({
+                f'questions-6-answers-{index}-letter': letter,
+                f'questions-6-answers-{index}-text': f'New answer {letter}',
+                f'questions-6-answers-{index}-is_correct': str(letter == 'D'),
+            })
+
+        test = self.get_test()
+        form_tree = TestFormTree(data, instance=test)
+        self.assertTrue(form_tree.is_valid())
+        # Deleting loads the questions and answers for their signals, then one INSERT
+        # and one UPDATE per model whatever the number of questions
+        with query_budget(8):
+            form_tree.save(test)
+
+        questions = list(self.test.questions.order_by('pk'))
+        self.assertEqual([question.text for question in questions],
+                         ['Changed question'] + [f'Question {index}' for index in range(1, 5)] + ['New question'])
+        self.assertEqual(
+            list(Answer.objects.filter(question__test=self.test, is_correct=True)
+                 .order_by('question').values_list('letter', flat=True)),
+            ['A', 'B', 'A', 'A', 'A', 'D'],
+        )
+        self.assertEqual(Answer.objects.filter(question__test=self.test).count(), 24)
+        self.assertEqual(Question.objects.get(pk=untouched.pk).updated_at, untouched.updated_at)
+
+    def test_save_unchanged(self):
+        test = self.get_test()
+        form_tree = TestFormTree(get_form_tree_data(self.test), instance=test)
+        with self.assertNumQueries(0):
+            self.assertTrue(form_tree.is_valid())
+        with query_budget(0):
+            form_tree.save(test)
+
+    def test_invalid(self):
+        data = get_form_tree_data(self.test)
+        data['questions-0-answers-1-is_correct'] = 'True'
+        data.update({'questions-4-DELETE': 'on', 'questions-5-DELETE': 'on'})
+        form_tree = TestFormTree(data, instance=self.get_test())
+        self.assertFalse(form_tree.is_valid())
+        self.assertEqual(form_tree.answer_formsets[0].non_form_errors(), ['Only one answer can be correct'])
+        self.assertEqual(form_tree.question_formset.non_form_errors(), ['Please submit at least 5 questions.'])
+
+
+class TaskQueueTests(CacheTestCase):
+
+    def setUp(self):
+        super().setUp()
+        self.user = User.objects.create_user('alice', password='password')
+        self.test = create_test(self.user)
+
+    def pass_test(self):
+        self.client.force_login(self.user)
+        self.client.post(reverse('test_pass', args=[self.test.pk]), {
+            f'question_{question_id}': answer_id for question_id, answer_id in get_answers(self.test).items()
+        })
+        return Result.objects.latest('pk')
+
+    def test_record_result(self):
+        result = self.pass_test()
+        task = Task.objects.get()
+        self.assertEqual((task.name, task.payload, task.status),
+                         (record_result.task_name, {'result_id': result.pk}, Task.PENDING))
+        self.assertFalse(CounterIncrement.objects.exists())
+
+        claimed = tasks.claim('worker', 10, 60)
+        self.assertEqual(claimed, [task])
+        self.assertEqual((claimed[0].status, claimed[0].attempts, claimed[0].locked_by), (Task.RUNNING, 1, 'worker'))
+        self.assertEqual(tasks.claim('other', 10, 60), [])
+        self.assertEqual(tasks.execute(claimed[0], 'worker'), 'done')
+        self.assertFalse(Task.objects.exists())
+
+        counters.flush()
+        self.test.refresh_from_db()
+        self.test.statistics.refresh_from_db()
+        self.assertEqual(self.test.passes_number, 1)
+        self.assertEqual((self.test.statistics.result_count, self.test.statistics.score_sum), (1, 5))
+
+    def test_retry_then_fail(self):
+        tasks.enqueue(comment_and_fail, test_id=self.test.pk, user_id=self.user.pk)
+        self.assertEqual(tasks.execute(tasks.claim('worker', 10, 60)[0], 'worker'), 'retry')
+        task = Task.objects.get()
+        self.assertEqual((task.status, task.attempts, task.locked_by), (Task.PENDING, 1, ''))
+        self.assertIn('ValueError: Failed', task.last_error)
+        self.assertAlmostEqual((task.run_at - timezone.now()).total_seconds(), tasks.RETRY_DELAY, delta=5)
+        # Writes of atomic tasks are rolled back with the failure
+        self.assertFalse(Comment.objects.exists())
+
+        # Not due before the backoff
+        self.assertEqual(tasks.claim('worker', 10, 60), [])
+        Task.objects.update(run_at=timezone.now())
+        self.assertEqual(tasks.execute(tasks.claim('worker', 10, 60)[0], 'worker'), 'failed')
+        task = Task.objects.get()
+        self.assertEqual((task.status, task.attempts), (Task.FAILED, 2))
+        self.assertEqual(tasks.claim('worker', 10, 60), [])
+
+    def test_expired_lease(self):
+        self.pass_test()
+        [task] = tasks.claim('dead', 10, 60)
+        Task.objects.update(locked_until=timezone.now() - timedelta(seconds=1))
+        [taken_over] = tasks.claim('other', 10, 60)
+        self.assertEqual((taken_over.locked_by, taken_over.attempts), ('other', 2))
+
+        # The first worker comes back, but the task is not its own anymore
+        self.assertEqual(tasks.execute(task, 'dead'), 'lost')
+        self.assertEqual(tasks.execute(taken_over, 'other'), 'done')
+        counters.flush()
+        self.test.refresh_from_db()
+        self.assertEqual(self.test.passes_number, 1)
+
+    def test_unknown_task(self):
+        Task.objects.create(name='tests.tests.missing', run_at=timezone.now())
+        self.assertEqual(tasks.execute(tasks.claim('worker', 10, 60)[0], 'worker'), 'failed')
+        self.assertEqual(Task.objects.get().status, Task.FAILED)
+
+    def test_rebuild_settles_queued_results(self):
+        self.pass_test()
+        self.pass_test()
+        statistics.rebuild([self.test.pk])
+        self.assertFalse(Task.objects.exists())
+
+        counters.flush()
+        self.test.refresh_from_db()
+        self.test.statistics.refresh_from_db()
+        self.assertEqual((self.test.passes_number, self.test.statistics.result_count), (2, 2))
+
+
+class ApiQueryCountTests(CacheTestCase):
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.user = User.objects.create_user('alice', password='password')
+        cls.owner = User.objects.create_user('bob', password='password')
+        cls.tests = [create_test(cls.owner, f'Test {index}') for index in range(5)]
+        cls.results = [
+            Result.objects.create(user=cls.user, test=test, score=3, question_count=5) for test in cls.tests
+        ]
+
+    def setUp(self):
+        super().setUp()
+        self.client.force_login(self.user)
+
+    def test_test_list(self):
+        with within_budget('api-test-list'):
+            response = self.client.get(reverse('api-test-list'))
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(len(response.json()['results']), 5)
+        self.assertEqual(response.json()['results'][0]['author'], 'bob')
+
+    def test_test_list_sparse_fields(self):
+        with within_budget('api-test-list'):
+            response = self.client.get(reverse('api-test-list'), {'fields': 'id,name', 'order_by': 'name'})
+        self.assertEqual(response.json()['results'][0], {'id': self.tests[0].pk, 'name': 'Test 0'})
+
+    def test_test_list_invalid_order(self):
+        for order_by in ['--name', 'user__password', '-']:
+            response = self.client.get(reverse('api-test-list'), {'order_by': order_by, 'fields': 'name'})
+            self.assertEqual(response.status_code, 200, order_by)
+            self.assertEqual(response.json()['results'][0]['name'], 'Test 4')
+
+    def test_test_detail(self):
+        with within_budget('api-test-detail'):
+            response = self.client.get(reverse('api-test-detail', args=[self.tests[0].pk]))
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.json()['result_count'], 0)
+
+    def test_test_questions(self):
+        with within_budget('api-test-questions'):
+            response = self.client.get(reverse('api-test-questions', args=[self.tests[0].pk]))
+        self.assertEqual(response.status_code, 200)
+        questions = response.json()['questions']
+        self.assertEqual(len(questions), 5)
+        self.assertEqual([answer['letter'] for answer in questions[0]['answers']], ['A', 'B', 'C', 'D'])
+        self.assertNotIn('is_correct', questions[0]['answers'][0])
+
+    def test_result_list(self):
+        with within_budget('api-result-list'):
+            response = self.client.get(reverse('api-result-list'))
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(len(response.json()['results']), 5)
+        self.assertEqual(response.json()['results'][0]['test_name'], 'Test 4')
+
+    def test_result_detail(self):
+        with within_budget('api-result-detail'):
+            response = self.client.get(reverse('api-result-detail', args=[self.results[0].pk]))
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.json()['score'], 3)
+
+    def test_submissions(self):
+        submissions = [
+            {'test': test.pk, 'answers': get_answers(test, correct=index % 2 == 0)}
+            for index, test in enumerate(self.tests)
+        ]
+        # Content types are looked up once per process
+        ContentType.objects.get_for_models(Test, TestStatistics)
+        # Builds all the answer keys at once, then reads them from the cache
+        for _ in range(2):
+            with within_budget('api-submission-list', 'POST'):
+                response = self.client.post(reverse('api-submission-list'),
+                                            json.dumps({'submissions': submissions}), content_type='application/json')
+            self.assertEqual(response.status_code, 201)
+            self.assertEqual([result['score'] for result in response.json()['results']], [5, 0, 5, 0, 5])
+        self.assertEqual(Result.objects.filter(user=self.user).count(), 15)
+
+    def test_submissions_for_others(self):
+        submission = {'test': self.tests[0].pk, 'user': self.user.pk, 'answers': get_answers(self.tests[0])}
+        self.client.force_login(self.owner)
+        response = self.client.post(reverse('api-submission-list'), json.dumps({'submissions': [submission]}),
+                                    content_type='application/json')
+        self.assertEqual(response.status_code, 403)
+
+        User.objects.filter(pk=self.owner.pk).update(is_staff=True)
+        response = self.client.post(reverse('api-submission-list'), json.dumps({'submissions': [submission]}),
+                                    content_type='application/json')
+        self.assertEqual(response.status_code, 201)
+        self.assertEqual(Result.objects.filter(user=self.user).count(), 6)
+
+
+class SubmissionValidationTests(CacheTestCase):
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.user = User.objects.create_user('alice', password='password')
+        cls.test = create_test(cls.user)
+
+    def setUp(self):
+        super().setUp()
+        self.client.force_login(self.user)
+
+    def submit(self, *submissions):
+        return self.client.post(reverse('api-submission-list'), json.dumps({'submissions': submissions}),
+                                content_type='application/json')
+
+    def test_invalid_ids(self):
+        answers = get_answers(self.test)
+        response = self.submit(
+            {'test': True, 'answers': answers},
+            {'test': self.test.pk, 'user': False, 'answers': answers},
+            {'test': self.test.pk, 'answers': {question_id: True for question_id in answers}},
+            {'test': self.test.pk, 'answers': answers},
+        )
+        self.assertEqual(response.status_code, 400)
+        self.assertEqual(list(response.json()['submissions']), ['0', '1', '2'])
+        self.assertFalse(Result.objects.exists())
+
+    def test_unknown_questions(self):
+        other = create_test(self.user, 'Other test')
+        answers = {**get_answers(self.test), 'abc': 1, **get_answers(other)}
+        response = self.submit({'test': self.test.pk, 'answers': answers})
+        self.assertEqual(response.status_code, 400)
+        [error] = response.json()['submissions']['0']
+        self.assertIn('abc', error)
+        for question_id in get_answers(other):
+            self.assertIn(str(question_id), error)
+        self.assertFalse(Result.objects.exists())
+
+
+@override_settings(STATICFILES_STORAGE='django.contrib.staticfiles.storage.StaticFilesStorage')
+class AsyncViewTests(CacheTestCase):
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.user = User.objects.create_user('alice', password='password')
+        cls.test = create_test(cls.user)
+        Result.objects.create(user=cls.user, test=cls.test, score=5, question_count=5)
+
+    def get_version(self, *args, **kwargs):
+        try:
+            asyncio.get_running_loop()
+        except RuntimeError:
+            return self.real_get_version(*args, **kwargs)
+        raise AssertionError('The cache was read from the event loop')
+
+    async def test_no_cache_access_on_the_event_loop(self):
+        self.real_get_version = caching.get_version
+        urls = [reverse('test_list'), reverse('test_detail', args=[self.test.pk])]
+        with mock.patch.object(caching, 'get_version', self.get_version):
+            # Anonymous pages go through the page cache
+            for url in urls:
+                response = await self.async_client.get(url)
+                self.assertEqual(response.status_code, 200, url)
+            await self.async_client.aforce_login(self.user)
+            for url in [*urls, reverse('test_results')]:
+                response = await self.async_client.get(url)
+                self.assertEqual(response.status_code, 200, url)
+
+
+@override_settings(STATICFILES_STORAGE='django.contrib.staticfiles.storage.StaticFilesStorage')
+class PageCacheTests(CacheTestCase):
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.user = User.objects.create_user('alice', password='password')
+        cls.test = create_test(cls.user)
+
+    def test_anonymous_pages(self):
+        for url in [reverse('test_list'), reverse('test_detail', args=[self.test.pk])]:
+            response = self.client.get(url)
+            self.assertEqual(response.status_code, 200, url)
+            with self.assertNumQueries(0):
+                cached = self.client.get(url)
+            self.assertEqual(cached.content, response.content, url)
+
+    def test_invalidation(self):
+        self.client.get(reverse('test_list'))
+        with self.captureOnCommitCallbacks(execute=True):
+            create_test(self.user, 'Another test')
+        self.assertContains(self.client.get(reverse('test_list')), 'Another test')
+
+    def test_authenticated_users_are_not_served_the_anonymous_page(self):
+        url = reverse('test_detail', args=[self.test.pk])
+        self.assertNotContains(self.client.get(url), 'alice</a>')
+        self.client.force_login(self.user)
+        self.assertContains(self.client.get(url), 'alice</a>')
+
+
+@override_settings(STATICFILES_STORAGE='django.contrib.staticfiles.storage.StaticFilesStorage')
+class ConditionalGetTests(CacheTestCase):
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.user = User.objects.create_user('alice', password='password')
+        cls.test = create_test(cls.user)
+        cls.result = Result.objects.create(user=cls.user, test=cls.test, score=5, question_count=5)
+
+    def setUp(self):
+        super().setUp()
+        self.client.force_login(self.user)
+
+    def test_result(self):
+        url = reverse('test_result', args=[self.result.pk])
+        response = self.client.get(url)
+        self.assertEqual(response.status_code, 200)
+        self.assertIn('private', response['Cache-Control'])
+
+        response = self.client.get(url, headers={'If-None-Match': response['ETag']})
+        self.assertEqual(response.status_code, 304)
+        self.assertEqual(response.content, b'')
+        response = self.client.get(url, headers={'If-Modified-Since': response['Last-Modified']})
+        self.assertEqual(response.status_code, 304)
+
+        etag = response['ETag']
+        Result.objects.filter(pk=self.result.pk).update(updated_at=timezone.now() + timedelta(seconds=1))
+        response = self.client.get(url, headers={'If-None-Match': etag})
+        self.assertEqual(response.status_code, 200)
+        self.assertNotEqual(response['ETag'], etag)
+
+    def test_detail(self):
+        url = reverse('test_detail', args=[self.test.pk])
+        etag = self.client.get(url)['ETag']
+        self.assertEqual(self.client.get(url, headers={'If-None-Match': etag}).status_code, 304)
+
+        # A comment changes the page without touching the test
+        with self.captureOnCommitCallbacks(execute=True):
+            response = self.client.post(reverse('test_comment', args=[self.test.pk]), {'text': 'Nice'})
+        self.assertEqual(response.status_code, 302)
+        self.assertEqual(self.client.get(url, headers={'If-None-Match': etag}).status_code, 200)
+
+    def test_user_in_etag(self):
+        url = reverse('test_detail', args=[self.test.pk])
+        etag = self.client.get(url)['ETag']
+        self.client.logout()
+        self.assertEqual(self.client.get(url, headers={'If-None-Match': etag}).status_code, 200)
+
+
+class ExportTests(CacheTestCase):
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.owner = User.objects.create_user('bob', password='password')
+        cls.test = create_test(cls.owner)
+        cls.results = [
+            Result.objects.create(user=User.objects.create_user(username, password='password'), test=cls.test,
+                                  score=score, question_count=5)
+            for score, username in enumerate(['alice', '=carol', 'dave'])
+        ]
+
+    def get_rows(self, content):
+        return list(csv.reader(io.StringIO(content)))
+
+    def test_export(self):
+        self.client.force_login(self.owner)
+        response = self.client.get(reverse('test_results_export', args=[self.test.pk]))
+        self.assertEqual(response.status_code, 200)
+        self.assertTrue(response.streaming)
+        self.assertEqual(response['Content-Type'], exports.EXPORT_CONTENT_TYPES['csv'])
+        rows = self.get_rows(b''.join(response.streaming_content).decode())
+        self.assertEqual(rows[0], exports.EXPORT_FIELDS)
+        self.assertEqual([row[:4] for row in rows[1:]], [
+            [str(result.pk), username, str(score), '5']
+            for score, (result, username) in enumerate(zip(self.results, ['alice', "'=carol", 'dave']))
+        ])
+
+        response = self.client.get(reverse('test_results_export', args=[self.test.pk]), {'format': 'jsonl'})
+        lines = [json.loads(line) for line in b''.join(response.streaming_content).splitlines()]
+        self.assertEqual([line['username'] for line in lines], ['alice', '=carol', 'dave'])
+
+    def test_export_of_another_user(self):
+        self.client.force_login(self.results[0].user)
+        response = self.client.get(reverse('test_results_export', args=[self.test.pk]))
+        self.assertEqual(response.status_code, 404)
+
+        self.client.logout()
+        response = self.client.get(reverse('test_results_export', args=[self.test.pk]))
+        self.assertEqual(response.status_code, 302)
+
+    def test_chunks(self):
+        chunks = list(exports.stream_results(self.test.pk, 'jsonl', chunk_size=2))
+        self.assertEqual([chunk.count('\n') for chunk in chunks], [2, 1])
+
+    def test_command(self):
+        stdout = io.StringIO()
+        call_command('export_results', self.test.pk, stdout=stdout)
+        rows = self.get_rows(stdout.getvalue())
+        self.assertEqual(len(rows), 4)
+        self.assertEqual(rows[2][1], "'=carol")
+
+
+class ImportTests(CacheTestCase):
+
+    def setUp(self):
+        super().setUp()
+        self.user = User.objects.create_user('alice', password='password')
+        self.client.force_login(self.user)
+
+    def get_record(self, name):
+        return json.dumps({'name': name, 'questions': [
+            {'text': f'Question {index}', 'answers': [
+                {'letter': letter, 'text': f'Answer {letter}', 'is_correct': letter == 'A'}
+                for letter, _ in Answer.LETTERS
+            ]}
+            for index in range(5)
+        ]})
+
+    def upload(self, name, content, **params):
+        url = reverse('api-test-import-tests')
+        if params:
+            url = f'{url}?{urlencode(params)}'
+        response = self.client.post(url, {'file': SimpleUploadedFile(name, content)})
+        self.assertEqual(response.status_code, 200)
+        return [json.loads(line) for line in response.content.splitlines()]
+
+    def test_import(self):
+        content = '\n'.join([self.get_record('First'), '{"name": ""}', self.get_record('Second')])
+        [progress] = self.upload('bank.jsonl', content.encode())
+        self.assertEqual((progress['processed'], progress['created']), (3, 2))
+        self.assertEqual([error['record'] for error in progress['errors']], [2])
+        self.assertEqual(list(Test.objects.order_by('pk').values_list('name', flat=True)), ['First', 'Second'])
+        self.assertEqual(Answer.objects.filter(question__test__user=self.user).count(), 40)
+
+    def test_not_utf8(self):
+        [progress] = self.upload('bank.jsonl', b'\xff\xfe' + 'x'.encode('utf-16-le'))
+        self.assertEqual(progress['errors'][0]['record'], 1)
+        self.assertIn('Not UTF-8', progress['errors'][0]['errors'][0])
+
+        # Lines before the invalid one are imported
+        content = f'{self.get_record("First")}\n'.encode() + b'\xff\n' + self.get_record('Second').encode()
+        [progress] = self.upload('bank.jsonl', content)
+        self.assertEqual((progress['created'], progress['errors'][0]['record']), (1, 2))
+        self.assertEqual(list(Test.objects.values_list('name', flat=True)), ['First'])
+
+    def test_import_format(self):
+        [progress] = self.upload('bank.txt', self.get_record('First').encode(), import_format='jsonl')
+        self.assertEqual(progress['created'], 1)
+
+        response = self.client.post(f'{reverse("api-test-import-tests")}?import_format=xml',
+                                    {'file': SimpleUploadedFile('bank.jsonl', b'')})
+        self.assertEqual(response.status_code, 400)
+        self.assertIn('import_format', response.json())
@@ -1,6 +1,6 @@
 from django.urls import path
 from .views import TestListView, TestDetailView, TestCreateView, TestUpdateView, TestDeleteView, TestPassView, \
-    TestResultsView, TestResultView, TestCommentView
+    TestResultsView, TestResultView, TestResultsExportView, TestCommentView, TestCommentListView, MetricsView
 
 urlpatterns = [
     path('', TestListView.as_view(), name='test_list'),
@@ -9,7 +9,10 @@ urlpatterns = [
     path('<int:pk>/edit/', TestUpdateView.as_view(), name='test_update'),
     path('<int:pk>/delete/', TestDeleteView.as_view(), name='test_delete'),
     path('<int:pk>/comment/', TestCommentView.as_view(), name='test_comment'),
+    path('<int:pk>/comments/', TestCommentListView.as_view(), name='test_comments'),
     path('<int:pk>/pass/', TestPassView.as_view(), name='test_pass'),
+    path('<int:pk>/results/export/', TestResultsExportView.as_view(), name='test_results_export'),
     path('results/', TestResultsView.as_view(), name='test_results'),
     path('results/<int:pk>/', TestResultView.as_view(), name='test_result'),
+    path('metrics/', MetricsView.as_view(), name='metrics'),
 ]
@@ -0,0 +1,95 @@
+import json
+import platform
+import statistics
+import subprocess
+import time
+
+from django.db import connection
+from django.test.utils import CaptureQueriesContext
+from django.utils import timezone
+
+
+BENCHMARK_USERNAME_PREFIX = 'bench_user_'
+# Regressions reported by compare_reports
+LATENCY_TOLERANCE = 1.2
+
+
+def summarize(latencies):
+    """
+    Latency percentiles in milliseconds of a list of durations in seconds.
+    """
+    latencies = sorted(latencies)
+    if not latencies:
+        return {'count': 0, 'p50_ms': None, 'p99_ms': None, 'mean_ms': None}
+    if len(latencies) == 1:
+        p50 = p99 = latencies[0]
+    else:
+        percentiles = statistics.quantiles(latencies, n=100, method='inclusive')
+        p50, p99 = percentiles[49], percentiles[98]
+    return {
+        'count': len(latencies),
+        'p50_ms': round(p50 * 1000, 3),
+        'p99_ms': round(p99 * 1000, 3),
+        'mean_ms': round(statistics.fmean(latencies) * 1000, 3),
+    }
+
+
+def measure(func, repeat=20, warmup=2):
+    """
+    Run `func` `warmup` times, then `repeat` times recording its duration and
+    the queries it ran. Query counts must be the same on every run of a
+    deterministic benchmark, the maximum is reported.
+    """
+    for _ in range(warmup):
+        func()
+
+    latencies, query_counts = [], []
+    for _ in range(repeat):
+        with CaptureQueriesContext(connection) as context:
+            start = time.perf_counter()
+            func()
+            latencies.append(time.perf_counter() - start)
+        query_counts.append(len(context.captured_queries))
+    return {**summarize(latencies), 'queries': max(query_counts)}
+
+
+def get_environment():
+    try:
+        commit = subprocess.run(
+            ['git', 'rev-parse', '--short', 'HEAD'], capture_output=True, text=True, check=True,
+        ).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        commit = None
+    return {
+        'created_at': timezone.now().isoformat(),
+        'commit': commit,
+        'python': platform.python_version(),
+        'database': connection.vendor,
+    }
+
+
+def write_report(path, kind, results):
+    report = {'kind': kind, 'environment': get_environment(), 'results': results}
+    with open(path, 'w') as file:
+        json.dump(report, file, indent=2, sort_keys=True)
+        file.write('\n')
+    return report
+
+
+def compare_reports(baseline, current):
+    """
+    Return a line per benchmark whose query count grew or whose p50 latency grew
+    beyond LATENCY_TOLERANCE compared to the baseline report.
+    """
+    regressions = []
+    for name, result in current['results'].items():
+        previous = baseline['results'].get(name)
+        if not previous:
+            continue
+        if result.get('queries') is not None and previous.get('queries') is not None \
+                and result['queries'] > previous['queries']:
+            regressions.append(f'{name}: {previous["queries"]} -> {result["queries"]} queries')
+        if result.get('p50_ms') and previous.get('p50_ms') \
+                and result['p50_ms'] > previous['p50_ms'] * LATENCY_TOLERANCE:
+            regressions.append(f'{name}: p50 {previous["p50_ms"]} -> {result["p50_ms"]} ms')
+    return regressions
@@ -0,0 +1,52 @@
+"""
+Versioned cache keys. Every model has a namespace version and every object
+its own version; invalidating bumps the version, so outdated entries are never
+read again and simply expire. Versions start from the current time, so a version
+evicted from the cache never comes back with a value that was already used.
+"""
+import time
+
+from django.core.cache import cache
+from django.db import transaction
+
+
+def get_label(model):
+    # A model, or the name of a namespace not tied to one
+    return model if isinstance(model, str) else model._meta.label_lower
+
+
+def get_version_key(model, pk=None):
+    return f'version:{get_label(model)}:{"*" if pk is None else pk}'
+
+
+def get_version(model, pk=None):
+    key = get_version_key(model, pk)
+    version = cache.get(key)
+    if version is None:
+        version = time.time_ns()
+        if not cache.add(key, version, None):
+            version = cache.get(key, version)
+    return version
+
+
+def make_key(model, *parts, pk=None):
+    """
+    Key of an entry depending on the object `pk` of `model`, or on the whole model if `pk` is None.
+    """
+    return ':'.join([get_label(model), '*' if pk is None else str(pk), str(get_version(model, pk)), *map(str, parts)])
+
+
+def invalidate(model, pk=None):
+    key = get_version_key(model, pk)
+    try:
+        cache.incr(key)
+    except ValueError:
+        cache.set(key, time.time_ns(), None)
+
+
+def invalidate_on_commit(model, pk=None):
+    """
+    Invalidate once the current transaction commits, so that no entry is rebuilt
+    from the data that is still being changed under the new version.
+    """
+    transaction.on_commit(lambda: invalidate(model, pk))
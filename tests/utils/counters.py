@@ -0,0 +1,71 @@
+from collections import Counter
+
+from django.contrib.contenttypes.models import ContentType
+from django.db import transaction
+from django.db.models import F
+
+from tests.models import CounterIncrement
+from tests.utils import caching
+
+
+def increment(instance, field, delta=1):
+    """
+    Record a counter increment without touching the row of `instance`,
+    so concurrent increments never wait on each other.
+    """
+    return CounterIncrement.objects.create(
+        content_type=ContentType.objects.get_for_model(instance),
+        object_id=instance.pk,
+        field=field,
+        delta=delta,
+    )
+
+
+def increment_bulk(deltas):
+    """
+    Record increments of several objects with a single INSERT,
+    `deltas` maps instances to {field: delta}.
+    """
+    return CounterIncrement.objects.bulk_create([
+        CounterIncrement(
+            content_type=ContentType.objects.get_for_model(instance),
+            object_id=instance.pk,
+            field=field,
+            delta=delta,
+        )
+        for instance, fields in deltas.items()
+        for field, delta in fields.items()
+        if delta
+    ])
+
+
+@transaction.atomic
+def flush(batch_size=1000):
+    """
+    Apply up to `batch_size` pending increments with one UPDATE per counter
+    and return the number of increments applied. Rows locked by another
+    flush are skipped, so concurrent flushes never apply a delta twice.
+    """
+    increments = list(CounterIncrement.objects
+                      .select_for_update(skip_locked=True)
+                      .order_by('pk')
+                      .values_list('pk', 'content_type_id', 'object_id', 'field', 'delta')[:batch_size])
+    if not increments:
+        return 0
+
+    totals = Counter()
+    for _, content_type_id, object_id, field, delta in increments:
+        totals[content_type_id, object_id, field] += delta
+
+    changed = set()
+    for (content_type_id, object_id, field), delta in totals.items():
+        if delta:
+            model = ContentType.objects.get_for_id(content_type_id).model_class()
+            model._base_manager.filter(pk=object_id).update(**{field: F(field) + delta})
+            changed.add((model, object_id))
+    # Pages showing the counters are cached per object
+    for model, object_id in changed:
+        caching.invalidate_on_commit(model, object_id)
+
+    CounterIncrement.objects.filter(pk__in=[increment[0] for increment in increments]).delete()
+    return len(increments)
@@ -0,0 +1,99 @@
+"""
+Streamed exports of the results of a test. Rows are read with a server-side cursor
+and written out in chunks, so memory use does not grow with the number of results.
+"""
+import csv
+import io
+import json
+
+from asgiref.sync import sync_to_async
+from django.db import connections
+
+from tests.models import Result
+
+
+EXPORT_FIELDS = ['id', 'username', 'score', 'question_count', 'created_at']
+EXPORT_CONTENT_TYPES = {
+    'csv': 'text/csv; charset=utf-8',
+    'jsonl': 'application/x-ndjson; charset=utf-8',
+}
+# Spreadsheets evaluate cells starting with these as formulas
+_FORMULA_PREFIXES = ('=', '+', '-', '@')
+
+
+def get_results(test_id):
+    return (Result.objects
+            .filter(test_id=test_id)
+            .order_by('pk')
+            .values_list('pk', 'user__username', 'score', 'question_count', 'created_at'))
+
+
+def iterate_rows(queryset, chunk_size):
+    """
+    Iterate over the rows of a values_list() queryset ordered by and starting with pk,
+    fetching `chunk_size` rows at a time.
+    """
+    if not connections[queryset.db].settings_dict.get('DISABLE_SERVER_SIDE_CURSORS'):
+        yield from queryset.iterator(chunk_size=chunk_size)
+        return
+    # Server-side cursors do not survive pgbouncer's transaction pooling, page by pk instead
+    last_pk = None
+    while True:
+        page = queryset if last_pk is None else queryset.filter(pk__gt=last_pk)
+        rows = list(page[:chunk_size])
+        if not rows:
+            return
+        yield from rows
+        last_pk = rows[-1][0]
+
+
+def _escape_csv(value):
+    if isinstance(value, str) and value.startswith(_FORMULA_PREFIXES):
+        return f"'{value}"
+    return value
+
+
+def stream_results(test_id, export_format, chunk_size=2000):
+    """
+    Yield the results of a test as CSV or JSON Lines text, `chunk_size` rows at a time.
+    """
+    buffer = io.StringIO()
+    writer = csv.writer(buffer) if export_format == 'csv' else None
+    if writer:
+        writer.writerow(EXPORT_FIELDS)
+
+    for index, (pk, username, score, question_count, created_at) in enumerate(
+        iterate_rows(get_results(test_id), chunk_size), 1,
+    ):
+        if writer:
+            writer.writerow([pk, _escape_csv(username), score, question_count, created_at.isoformat()])
+        else:
+            buffer.write(json.dumps({
+                'id': pk,
+                'username': username,
+                'score': score,
+                'question_count': question_count,
+                'created_at': created_at.isoformat(),
+            }) + '\n')
+        if index % chunk_size == 0:
+            yield buffer.getvalue()
+            buffer.seek(0)
+            buffer.truncate()
+
+    if buffer.tell():
+        yield buffer.getvalue()
+
+
+async def aiterate(iterator):
+    """
+    Consume a sync iterator reading the database from async code one item at a time
+    (ASGI buffers a whole sync iterator before sending it).
+    """
+    sentinel = object()
+    try:
+        while (item := await sync_to_async(next)(iterator, sentinel)) is not sentinel:
+            yield item
+    finally:
+        # Closes the database cursor when the client goes away
+        if hasattr(iterator, 'close'):
+            await sync_to_async(iterator.close)()
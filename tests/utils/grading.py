@@ -0,0 +1,77 @@
+from dataclasses import dataclass
+
+from django.core.exceptions import SuspiciousOperation
+
+
+class InvalidSubmission(SuspiciousOperation):
+    pass
+
+
+@dataclass(frozen=True)
+class QuestionGrade:
+    question_id: int
+    selected_answer_id: int | None
+    correct_answer_id: int | None
+
+    @property
+    def is_correct(self):
+        return self.selected_answer_id is not None and self.selected_answer_id == self.correct_answer_id
+
+
+@dataclass(frozen=True)
+class GradingResult:
+    questions: tuple[QuestionGrade, ...]
+
+    @property
+    def score(self):
+        return sum(grade.is_correct for grade in self.questions)
+
+    @property
+    def question_count(self):
+        return len(self.questions)
+
+
+class AnswerKey:
+    """
+    Answer ids of every question of a test together with the correct one,
+    so a whole submission is graded in memory.
+    """
+
+    def __init__(self, answers):
+        # {question_id: (frozenset of answer ids, correct answer id or None)}
+        self.answers = answers
+
+    @classmethod
+    def from_rows(cls, rows):
+        answer_ids, correct_ids = {}, {}
+        for question_id, answer_id, is_correct in rows:
+            answer_ids.setdefault(question_id, set())
+            if answer_id is None:
+                continue
+            answer_ids[question_id].add(answer_id)
+            if is_correct:
+                correct_ids[question_id] = answer_id
+        return cls({
+            question_id: (frozenset(ids), correct_ids.get(question_id))
+            for question_id, ids in answer_ids.items()
+        })
+
+    def grade(self, data):
+        """
+        Grade submitted data holding `question_<id>` -> answer id pairs.
+        Raises InvalidSubmission for answer ids not belonging to their question.
+        """
+        grades = []
+        for question_id, (answer_ids, correct_id) in self.answers.items():
+            selected = data.get(f'question_{question_id}')
+            if selected in (None, ''):
+                selected = None
+            else:
+                try:
+                    selected = int(selected)
+                except (TypeError, ValueError):
+                    raise InvalidSubmission(f'Invalid answer for question {question_id}')
+                if selected not in answer_ids:
+                    raise InvalidSubmission(f'Answer {selected} does not belong to question {question_id}')
+            grades.append(QuestionGrade(question_id, selected, correct_id))
+        return GradingResult(tuple(grades))
@@ -0,0 +1,221 @@
+"""
+Bulk import of question banks. Every record is one test, validated with the forms
+and formsets of the test editor (at least 5 questions, 4 answers each, exactly one
+correct answer) and saved with a few bulk INSERTs per chunk of tests.
+
+JSON Lines, one test per line:
+    {"name": "...", "description": "...", "questions": [
+        {"text": "...", "answers": [{"letter": "A", "text": "...", "is_correct": true}, ...]}, ...]}
+CSV, one answer per row, rows of a test (and of a question) following each other:
+    test,name,description,question,letter,answer,is_correct
+"""
+import codecs
+import csv
+import itertools
+import json
+
+from django.db import transaction
+
+from tests.forms import TestForm, TestFormTree
+from tests.models import Test, Question, Answer, TestStatistics
+from tests.utils import caching
+from tests.utils.search import get_search_vector, is_full_text_supported
+
+
+IMPORT_FORMATS = ('jsonl', 'csv')
+CSV_FIELDS = ['test', 'name', 'description', 'question', 'letter', 'answer', 'is_correct']
+_TRUE_VALUES = ('1', 'true', 'yes', 'y', 'x')
+
+
+def get_format(filename):
+    extension = filename.rsplit('.', 1)[-1].lower()
+    return extension if extension in IMPORT_FORMATS else None
+
+
+def decode_lines(lines):
+    """
+    Decode the lines of a binary file one at a time, so that invalid UTF-8 is
+    reported at its line and the lines before it are still imported.
+    """
+    decoder = codecs.getincrementaldecoder('utf-8-sig')()
+    for line in lines:
+        yield decoder.decode(line)
+
+
+def _get_decode_error(error):
+    # Raised while the file is read, so nothing after it can be imported
+    return f'Not UTF-8 text ({error.reason}), the rest of the file was not read'
+
+
+def read_jsonl(lines):
+    """
+    Yield (line number, record or None, errors) for every non-empty line.
+    """
+    number = 0
+    try:
+        for number, line in enumerate(lines, 1):
+            if not line.strip():
+                continue
+            try:
+                record = json.loads(line)
+            except ValueError as error:
+                yield number, None, [f'Invalid JSON: {error}']
+                continue
+            if not isinstance(record, dict):
+                yield number, None, ['Must be an object']
+                continue
+            yield number, record, []
+    except UnicodeDecodeError as error:
+        yield number + 1, None, [_get_decode_error(error)]
+
+
+def read_csv(lines):
+    """
+    Yield (line number of the first row, record or None, errors) for every test.
+    """
+    reader = csv.DictReader(lines)
+    try:
+        missing = set(CSV_FIELDS) - set(reader.fieldnames or [])
+        if missing:
+            yield 1, None, [f'Missing columns: {", ".join(sorted(missing))}']
+            return
+        yield from _read_csv_records(reader)
+    except UnicodeDecodeError as error:
+        yield reader.line_num + 1, None, [_get_decode_error(error)]
+
+
+def _read_csv_records(reader):
+    numbered_rows = ((reader.line_num, row) for row in reader)
+    for _, rows in itertools.groupby(numbered_rows, key=lambda item: item[1]['test']):
+        numbers, rows = zip(*rows)
+        questions = []
+        for text, answer_rows in itertools.groupby(rows, key=lambda row: row['question']):
+            questions.append({
+                'text': text,
+                'answers': [
+                    {
+                        'letter': row['letter'],
+                        'text': row['answer'],
+                        'is_correct': (row['is_correct'] or '').strip().lower() in _TRUE_VALUES,
+                    }
+                    for row in answer_rows
+                ],
+            })
+        yield numbers[0], {'name': rows[0]['name'], 'description': rows[0]['description'], 'questions': questions}, []
+
+
+def get_form_data(record):
+    """
+    The data the test editor would post for `record`.
+    """
+    questions = record.get('questions')
+    questions = questions if isinstance(questions, list) else []
+    data = {
+        'name': record.get('name') or '',
+        'description': record.get('description') or '',
+        'questions-TOTAL_FORMS': len(questions),
+        'questions-INITIAL_FORMS': 0,
+    }
+    for index, question in enumerate(questions):
+        question = question if isinstance(question, dict) else {}
+        prefix = f'questions-{index}'
+        answers = question.get('answers')
+        answers = answers if isinstance(answers, list) else []
+        data[f'{prefix}-text'] = question.get('text') or ''
+        data[f'{prefix}-answers-TOTAL_FORMS'] = len(answers)
+        data[f'{prefix}-answers-INITIAL_FORMS'] = 0
+        for answer_index, answer in enumerate(answers):
+            answer = answer if isinstance(answer, dict) else {}
+            answer_prefix = f'{prefix}-answers-{answer_index}'
+            data[f'{answer_prefix}-letter'] = answer.get('letter') or ''
+            data[f'{answer_prefix}-text'] = answer.get('text') or ''
+            data[f'{answer_prefix}-is_correct'] = str(answer.get('is_correct') is True)
+    return data
+
+
+def _format_errors(label, errors):
+    return [f'{label}{field}: {message}' if field != '__all__' else f'{label}{message}'
+            for field, messages in errors.items() for message in messages]
+
+
+def validate(record):
+    """
+    Return (test form, form tree) when `record` is a valid test, otherwise the list of errors.
+    """
+    data = get_form_data(record)
+    form = TestForm(data)
+    form_tree = TestFormTree(data)
+    valid = form.is_valid()
+    valid = form_tree.is_valid() and valid
+
+    # Not checked by the editor, where letters are fixed
+    letter_errors = [
+        f'question {index}: Answer letters must be different'
+        for index, (_, answer_formset) in enumerate(form_tree.get_kept_question_forms(), 1)
+        if len({answer_form.cleaned_data.get('letter') for answer_form in answer_formset})
+        < answer_formset.total_form_count()
+    ]
+    if valid and not letter_errors:
+        return form, form_tree
+
+    errors = letter_errors
+    errors += _format_errors('', form.errors)
+    errors += [str(message) for message in form_tree.question_formset.non_form_errors()]
+    for index, (question_form, answer_formset) in enumerate(form_tree.get_kept_question_forms(), 1):
+        errors += _format_errors(f'question {index} ', question_form.errors)
+        errors += [f'question {index}: {message}' for message in answer_formset.non_form_errors()]
+        for answer_index, answer_form in enumerate(answer_formset, 1):
+            errors += _format_errors(f'question {index} answer {answer_index} ', answer_form.errors)
+    return errors
+
+
+@transaction.atomic
+def save(user, trees):
+    """
+    Save validated (test form, form tree) pairs with one INSERT per model.
+    """
+    tests, questions, answers = [], [], []
+    for form, form_tree in trees:
+        test = Test(user=user, name=form.cleaned_data['name'], description=form.cleaned_data['description'])
+        tests.append(test)
+        for question_form, answer_formset in form_tree.get_kept_question_forms():
+            question = Question(test=test, text=question_form.cleaned_data['text'])
+            questions.append(question)
+            answers += [
+                Answer(question=question, **{field: answer_form.cleaned_data[field]
+                                             for field in ('letter', 'text', 'is_correct')})
+                for answer_form in answer_formset
+            ]
+
+    Test.objects.bulk_create(tests)
+    # Bulk inserts send no signals
+    TestStatistics.objects.bulk_create([TestStatistics(test=test) for test in tests])
+    Question.objects.bulk_create(questions, batch_size=1000)
+    Answer.objects.bulk_create(answers, batch_size=1000)
+    if is_full_text_supported():
+        Test.objects.filter(pk__in=[test.pk for test in tests]).update(search_vector=get_search_vector())
+    caching.invalidate_on_commit(Test)
+    return tests
+
+
+def import_tests(records, user, chunk_size=100):
+    """
+    Validate and save the (number, record, errors) items of read_jsonl/read_csv,
+    `chunk_size` tests per transaction, yielding the progress after every chunk:
+        {'processed': 100, 'created': 98, 'errors': [{'record': 12, 'errors': [...]}]}
+    with the counts so far and the errors of the chunk.
+    """
+    processed = created = 0
+    records = iter(records)
+    while chunk := list(itertools.islice(records, chunk_size)):
+        valid, errors = [], []
+        for number, record, record_errors in chunk:
+            result = validate(record) if record is not None else record_errors
+            if isinstance(result, list):
+                errors.append({'record': number, 'errors': result})
+            else:
+                valid.append(result)
+        if valid:
+            created += len(save(user, valid))
+        processed += len(chunk)
+        yield {'processed': processed, 'created': created, 'errors': errors}
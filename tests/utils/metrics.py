@@ -0,0 +1,95 @@
+"""
+Process-local counters, gauges and timers, exported in the Prometheus text format
+by MetricsView. Every worker process keeps its own values, so a scraper sees the
+worker that served the scrape: label or aggregate by instance accordingly.
+"""
+import threading
+import time
+from collections import defaultdict
+from contextlib import contextmanager
+
+
+_lock = threading.Lock()
+_counters = defaultdict(int)
+_gauges = {}
+# (name, labels) -> [count, sum of seconds]
+_timers = defaultdict(lambda: [0, 0.0])
+
+
+def _get_key(name, labels):
+    return name, tuple(sorted(labels.items()))
+
+
+def increment(name, value=1, **labels):
+    with _lock:
+        _counters[_get_key(name, labels)] += value
+
+
+def set_gauge(name, value, **labels):
+    with _lock:
+        _gauges[_get_key(name, labels)] = value
+
+
+def observe(name, seconds, **labels):
+    with _lock:
+        timer = _timers[_get_key(name, labels)]
+        timer[0] += 1
+        timer[1] += seconds
+
+
+@contextmanager
+def timer(name, **labels):
+    start = time.perf_counter()
+    try:
+        yield
+    finally:
+        observe(name, time.perf_counter() - start, **labels)
+
+
+def reset():
+    with _lock:
+        _counters.clear()
+        _gauges.clear()
+        _timers.clear()
+
+
+def _escape(value):
+    return str(value).replace('\\', '\\\\').replace('"', '\\"').replace('\n', '\\n')
+
+
+def _format_sample(name, labels, value):
+    if labels:
+        label_text = ','.join(f'{key}="{_escape(label)}"' for key, label in labels)
+        name = f'{name}{{{label_text}}}'
+    return f'{name} {value}'
+
+
+def render():
+    """
+    Return every metric in the Prometheus text exposition format.
+    Timers are exported as summaries (`_count` and `_sum` in seconds).
+    """
+    with _lock:
+        counters = sorted(_counters.items())
+        gauges = sorted(_gauges.items())
+        timers = sorted((key, tuple(value)) for key, value in _timers.items())
+
+    lines = []
+    declared = set()
+
+    def declare(name, kind):
+        if name not in declared:
+            declared.add(name)
+            lines.append(f'# TYPE {name} {kind}')
+
+    for (name, labels), value in counters:
+        declare(name, 'counter')
+        lines.append(_format_sample(name, labels, value))
+    for (name, labels), value in gauges:
+        declare(name, 'gauge')
+        lines.append(_format_sample(name, labels, value))
+    for (name, labels), (count, total) in timers:
+        declare(name, 'summary')
+        lines.append(_format_sample(f'{name}_count', labels, count))
+        lines.append(_format_sample(f'{name}_sum', labels, total))
+    return '\n'.join(lines) + '\n'
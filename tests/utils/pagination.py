@@ -0,0 +1,145 @@
+import base64
+import json
+
+from django.core.exceptions import ValidationError
+from django.db.models import Q
+from django.http import Http404
+
+
+class CursorPage:
+
+    def __init__(self, object_list, next_cursor=None, previous_cursor=None):
+        self.object_list = object_list
+        self.next_cursor = next_cursor
+        self.previous_cursor = previous_cursor
+
+    def __iter__(self):
+        return iter(self.object_list)
+
+    def __len__(self):
+        return len(self.object_list)
+
+    def has_next(self):
+        return self.next_cursor is not None
+
+    def has_previous(self):
+        return self.previous_cursor is not None
+
+    def has_other_pages(self):
+        return self.has_next() or self.has_previous()
+
+
+def get_cursor_ordering(queryset):
+    ordering = next(iter(queryset.query.order_by), '-pk')
+    descending = ordering.startswith('-')
+    name = ordering.lstrip('-')
+    if name in ('pk', 'id'):
+        return None, None, descending
+    if name in queryset.query.annotations:
+        field = queryset.query.annotations[name].output_field
+    else:
+        field = queryset.model._meta.get_field(name)
+    return name, field, descending
+
+
+def encode_cursor(obj, name, direction):
+    value = getattr(obj, name) if name else None
+    if hasattr(value, 'isoformat'):
+        value = value.isoformat()
+    payload = json.dumps([direction, value, obj.pk], separators=(',', ':'))
+    return base64.urlsafe_b64encode(payload.encode()).decode().rstrip('=')
+
+
+def decode_cursor(cursor, field):
+    try:
+        payload = base64.urlsafe_b64decode(cursor + '=' * (-len(cursor) % 4))
+        direction, value, pk = json.loads(payload)
+        if direction not in ('next', 'prev'):
+            raise ValueError
+        return direction, field.to_python(value) if field else None, int(pk)
+    except (ValueError, TypeError, ValidationError):
+        raise Http404('Invalid cursor')
+
+
+def _get_page_query(queryset, page_size, cursor):
+    name, field, descending = get_cursor_ordering(queryset)
+
+    position = None
+    direction = 'next'
+    if cursor == 'last':
+        direction = 'prev'
+    elif cursor:
+        direction, value, pk = decode_cursor(cursor, field)
+        position = (value, pk)
+
+    # Walking backwards is walking forwards over the reversed ordering
+    reverse = descending != (direction == 'prev')
+    lookup = 'lt' if reverse else 'gt'
+    ordering = ['-pk' if reverse else 'pk']
+    if name:
+        ordering.insert(0, f'-{name}' if reverse else name)
+    queryset = queryset.order_by(*ordering)
+
+    if position:
+        value, pk = position
+        condition = Q(**{f'pk__{lookup}': pk})
+        if name:
+            condition = Q(**{f'{name}__{lookup}': value}) | Q(condition, **{name: value})
+        queryset = queryset.filter(condition)
+
+    return queryset[:page_size + 1], name, direction, position is not None
+
+
+def _make_page(object_list, page_size, name, direction, has_position):
+    has_more = len(object_list) > page_size
+    object_list = object_list[:page_size]
+    if direction == 'prev':
+        object_list.reverse()
+
+    if direction == 'next':
+        has_next, has_previous = has_more, has_position
+    else:
+        has_next, has_previous = has_position, has_more
+    if not object_list:
+        has_next = has_previous = False
+
+    return CursorPage(
+        object_list,
+        next_cursor=encode_cursor(object_list[-1], name, 'next') if has_next else None,
+        previous_cursor=encode_cursor(object_list[0], name, 'prev') if has_previous else None,
+    )
+
+
+def paginate_by_cursor(queryset, page_size, cursor=None):
+    """
+    Keyset pagination: pages are addressed by the position of their first/last
+    row in the ordering of `queryset` (plus pk as a tie-breaker) instead of an
+    offset, so no COUNT(*) is run and deep pages cost the same as the first one.
+    The cursor `last` addresses the end of the list.
+    """
+    queryset, *page_args = _get_page_query(queryset, page_size, cursor)
+    return _make_page(list(queryset), page_size, *page_args)
+
+
+async def apaginate_by_cursor(queryset, page_size, cursor=None):
+    queryset, *page_args = _get_page_query(queryset, page_size, cursor)
+    return _make_page([obj async for obj in queryset], page_size, *page_args)
+
+
+class CursorPaginationMixin:
+    """
+    Cursor (keyset) pagination for ListView, see paginate_by_cursor.
+    Async views fetch the page beforehand into `cursor_page`.
+    """
+
+    cursor_kwarg = 'cursor'
+    cursor_page = None
+
+    def paginate_queryset(self, queryset, page_size):
+        page = self.cursor_page
+        if page is None:
+            page = paginate_by_cursor(queryset, page_size, self.request.GET.get(self.cursor_kwarg))
+        return None, page, page.object_list, page.has_other_pages()
+
+    async def apaginate_queryset(self, queryset, page_size):
+        self.cursor_page = await apaginate_by_cursor(queryset, page_size, self.request.GET.get(self.cursor_kwarg))
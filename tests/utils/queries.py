@@ -0,0 +1,104 @@
+import functools
+import re
+import time
+from collections import Counter
+from contextlib import contextmanager
+from contextvars import ContextVar
+
+
+# Not counted: they come with atomic blocks, not with what a view reads or writes
+TRANSACTION_CONTROL = re.compile(r'^\s*(BEGIN|COMMIT|ROLLBACK|SAVEPOINT|RELEASE SAVEPOINT)\b', re.IGNORECASE)
+_IN_LIST = re.compile(r'\((?:\s*%s\s*,)+\s*%s\s*\)')
+_LITERALS = re.compile(r"'(?:[^']|'')*'|\b\d+\b")
+
+# Recorders of the current request, followed into the threads of sync_to_async
+_recorders = ContextVar('query_recorders', default=())
+
+
+class QueryBudgetExceeded(AssertionError):
+    pass
+
+
+def get_fingerprint(sql):
+    """
+    SQL with literals and IN lists collapsed, so the queries of an N+1 loop share it.
+    """
+    sql = _IN_LIST.sub('(...)', sql)
+    sql = _LITERALS.sub('?', sql)
+    return ' '.join(sql.split())
+
+
+def install(connection):
+    """
+    Let recorders see the queries of `connection`, called for every new connection.
+    """
+    if _execute not in connection.execute_wrappers:
+        connection.execute_wrappers.append(_execute)
+
+
+def _execute(execute, sql, params, many, context):
+    for recorder in _recorders.get():
+        execute = functools.partial(recorder, execute)
+    return execute(sql, params, many, context)
+
+
+class QueryRecorder:
+    """
+    Counts and times the queries run on every database connection while recording,
+    without requiring DEBUG (unlike CaptureQueriesContext). Only the queries of the
+    current context are seen, including those an async view runs with sync_to_async.
+    """
+
+    def __init__(self, keep_queries=0):
+        self.count = 0
+        self.duration = 0.0
+        self.fingerprints = Counter()
+        # The first `keep_queries` queries with their duration in ms
+        self.keep_queries = keep_queries
+        self.queries = []
+
+    def __call__(self, execute, sql, params, many, context):
+        if TRANSACTION_CONTROL.match(sql):
+            return execute(sql, params, many, context)
+        start = time.perf_counter()
+        try:
+            return execute(sql, params, many, context)
+        finally:
+            duration = time.perf_counter() - start
+            self.count += 1
+            self.duration += duration
+            self.fingerprints[get_fingerprint(sql)] += 1
+            if len(self.queries) < self.keep_queries:
+                self.queries.append({'sql': sql, 'ms': round(duration * 1000, 3)})
+
+    @property
+    def duplicates(self):
+        return {sql: count for sql, count in self.fingerprints.items() if count > 1}
+
+    @contextmanager
+    def record(self):
+        token = _recorders.set((*_recorders.get(), self))
+        try:
+            yield self
+        finally:
+            _recorders.reset(token)
+
+    def describe(self, label, budget):
+        description = f'{label} ran {self.count} queries (budget {budget}) in {self.duration * 1000:.1f} ms'
+        for sql, count in sorted(self.duplicates.items(), key=lambda item: -item[1]):
+            description += f'\n  {count}x {sql[:300]}'
+        return description
+
+
+@contextmanager
+def query_budget(budget, label='Block'):
+    """
+    Fail when the block runs more than `budget` queries, listing the repeated ones:
+        with query_budget(3):
+            client.get(reverse('test_list'))
+    """
+    recorder = QueryRecorder()
+    with recorder.record():
+        yield recorder
+    if recorder.count > budget:
+        raise QueryBudgetExceeded(recorder.describe(label, budget))
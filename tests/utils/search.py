@@ -0,0 +1,56 @@
+from django.contrib.postgres.aggregates import StringAgg
+from django.contrib.postgres.search import SearchQuery, SearchRank, SearchVector
+from django.db import connection
+from django.db.models import Case, F, IntegerField, OuterRef, Q, Subquery, TextField, Value, When
+from django.db.models.functions import Cast, Coalesce
+
+from tests.models import Test, Question
+
+
+SEARCH_CONFIG = 'english'
+# Ranks are stored as integers so that cursor pagination compares them exactly
+RANK_SCALE = 1_000_000
+
+
+def is_full_text_supported():
+    return connection.vendor == 'postgresql'
+
+
+def get_search_vector():
+    question_text = (Question.objects
+                     .filter(test=OuterRef('pk'))
+                     .values('test')
+                     .annotate(text=StringAgg('text', ' '))
+                     .values('text'))
+    question_text = Coalesce(Subquery(question_text), Value(''), output_field=TextField())
+    return (
+        SearchVector('name', weight='A', config=SEARCH_CONFIG)
+        + SearchVector('description', weight='B', config=SEARCH_CONFIG)
+        + SearchVector(question_text, weight='C', config=SEARCH_CONFIG)
+    )
+
+
+def update_search_vector(test_id):
+    """
+    Refresh the search vector of one test, including its question text.
+    Must run after the questions have been saved.
+    """
+    if is_full_text_supported():
+        Test.objects.filter(pk=test_id).update(search_vector=get_search_vector())
+
+
+def search_tests(queryset, query):
+    """
+    Filter tests matching `query` and annotate them with an integer `rank`.
+    Uses the GIN-indexed search vector on PostgreSQL and falls back to
+    case-insensitive matching of name and description elsewhere (SQLite in development).
+    """
+    if is_full_text_supported():
+        search_query = SearchQuery(query, config=SEARCH_CONFIG, search_type='websearch')
+        return queryset.filter(search_vector=search_query).annotate(
+            rank=Cast(SearchRank(F('search_vector'), search_query) * RANK_SCALE, IntegerField()),
+        )
+
+    return queryset.filter(Q(name__icontains=query) | Q(description__icontains=query)).annotate(
+        rank=Case(When(name__icontains=query, then=Value(2)), default=Value(1), output_field=IntegerField()),
+    )
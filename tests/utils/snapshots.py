@@ -0,0 +1,106 @@
+from dataclasses import dataclass
+
+from django.core.cache import cache
+
+from tests.models import Question
+from tests.utils import caching
+from tests.utils.grading import AnswerKey
+
+
+SNAPSHOT_TIMEOUT = 60 * 60 * 24
+# Versioned apart from Test, whose version also changes with comments and counters
+SNAPSHOT_NAMESPACE = 'tests.snapshot'
+
+
+@dataclass(frozen=True)
+class AnswerSnapshot:
+    id: int
+    letter: str
+    text: str
+
+
+@dataclass(frozen=True)
+class QuestionSnapshot:
+    id: int
+    text: str
+    answers: tuple[AnswerSnapshot, ...]
+
+
+@dataclass(frozen=True)
+class TestSnapshot:
+    """
+    Immutable question/answer tree of a test.
+    Answer correctness only lives in `answer_key` and is never rendered.
+    """
+
+    test_id: int
+    questions: tuple[QuestionSnapshot, ...]
+    answer_key: AnswerKey
+
+
+def build_snapshots(test_ids):
+    """
+    Build the snapshots of several tests with one query.
+    """
+    rows = {test_id: [] for test_id in test_ids}
+    for test_id, *row in (Question.objects
+                          .filter(test_id__in=rows)
+                          .order_by('test_id', 'pk', 'answers__letter', 'answers__pk')
+                          .values_list('test_id', 'pk', 'text', 'answers__pk', 'answers__letter', 'answers__text',
+                                       'answers__is_correct')):
+        rows[test_id].append(row)
+    return {test_id: _build_snapshot(test_id, test_rows) for test_id, test_rows in rows.items()}
+
+
+def build_snapshot(test_id):
+    return build_snapshots([test_id])[test_id]
+
+
+def _build_snapshot(test_id, rows):
+    questions = {}
+    for question_id, question_text, answer_id, letter, answer_text, _ in rows:
+        answers = questions.setdefault(question_id, (question_text, []))[1]
+        if answer_id is not None:
+            answers.append(AnswerSnapshot(answer_id, letter, answer_text))
+
+    return TestSnapshot(
+        test_id=test_id,
+        questions=tuple(
+            QuestionSnapshot(question_id, text, tuple(answers))
+            for question_id, (text, answers) in questions.items()
+        ),
+        answer_key=AnswerKey.from_rows(
+            (question_id, answer_id, is_correct) for question_id, _, answer_id, _, _, is_correct in rows
+        ),
+    )
+
+
+def get_snapshot(test_id):
+    """
+    Return the snapshot of the current version of the test, building and caching it on a miss.
+    Saving or deleting the test, its questions or answers bumps the version (see tests.signals).
+    """
+    key = caching.make_key(SNAPSHOT_NAMESPACE, pk=test_id)
+    snapshot = cache.get(key)
+    if snapshot is None:
+        snapshot = build_snapshot(test_id)
+        cache.set(key, snapshot, SNAPSHOT_TIMEOUT)
+    return snapshot
+
+
+def get_snapshots(test_ids):
+    """
+    {test id: snapshot} of several tests, like get_snapshot() but building all the missing ones with one query.
+    """
+    keys = {test_id: caching.make_key(SNAPSHOT_NAMESPACE, pk=test_id) for test_id in test_ids}
+    cached = cache.get_many(keys.values())
+    result = {test_id: cached[key] for test_id, key in keys.items() if key in cached}
+    if missing := keys.keys() - result.keys():
+        built = build_snapshots(missing)
+        cache.set_many({keys[test_id]: snapshot for test_id, snapshot in built.items()}, SNAPSHOT_TIMEOUT)
+        result.update(built)
+    return result
+
+
+def invalidate_snapshot(test_id):
+    caching.invalidate_on_commit(SNAPSHOT_NAMESPACE, test_id)
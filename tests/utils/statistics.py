@@ -0,0 +1,91 @@
+from collections import Counter
+
+from django.contrib.contenttypes.models import ContentType
+from django.db import transaction
+from django.db.models import Count
+
+from tests.models import Test, Result, TestStatistics, CounterIncrement, Task
+from tests.utils import caching, counters
+
+
+# Name of tests.tasks.record_result, which adds a new result to the statistics
+RECORD_RESULT_TASK = 'tests.tasks.record_result'
+
+
+def get_deltas(results):
+    """
+    Statistics increments of new results summed by test, as {TestStatistics: {field: delta}}.
+    """
+    deltas = {}
+    for result in results:
+        fields = deltas.setdefault(result.test_id, Counter())
+        fields.update({
+            'result_count': 1,
+            'score_sum': result.score,
+            'question_sum': result.question_count,
+            TestStatistics.get_bucket_field(result.score, result.question_count): 1,
+        })
+    return {TestStatistics(pk=test_id): fields for test_id, fields in deltas.items()}
+
+
+def settle_queued_results(results):
+    """
+    Take the results of `results` whose record_result task has not run yet out of
+    the queue, only counting their passes, as they are counted in the rebuilt statistics.
+    """
+    # Waits for the tasks being run, whose increments are then dropped with the pending ones
+    queued = dict(Task.objects
+                  .select_for_update()
+                  .filter(name=RECORD_RESULT_TASK)
+                  .values_list('payload__result_id', 'pk'))
+    settled = dict(results.filter(pk__in=list(queued)).values_list('pk', 'test_id'))
+    passes = Counter(settled.values())
+    counters.increment_bulk({Test(pk=test_id): {'passes_number': count} for test_id, count in passes.items()})
+    Task.objects.filter(pk__in=[queued[result_id] for result_id in settled]).delete()
+
+
+@transaction.atomic
+def rebuild(test_ids=None):
+    """
+    Recompute the statistics of the given tests (all tests by default) from their
+    results with one grouped query, dropping increments not flushed yet and settling
+    the queued record_result tasks of the results counted.
+    Returns the number of statistics rows written.
+    """
+    tests = Test.objects.all()
+    results = Result.objects.all()
+    pending = CounterIncrement.objects.filter(content_type=ContentType.objects.get_for_model(TestStatistics))
+    if test_ids is not None:
+        tests = tests.filter(pk__in=test_ids)
+        results = results.filter(test_id__in=test_ids)
+        pending = pending.filter(object_id__in=test_ids)
+    settle_queued_results(results)
+    pending.delete()
+
+    # Scores and question counts are small numbers, so the grouped rows stay few
+    rows = (results
+            .values_list('test_id', 'score', 'question_count')
+            .annotate(count=Count('pk'))
+            .order_by())
+
+    statistics = {test_id: TestStatistics(test_id=test_id) for test_id in tests.values_list('pk', flat=True)}
+    for test_id, score, question_count, count in rows:
+        item = statistics.setdefault(test_id, TestStatistics(test_id=test_id))
+        item.result_count += count
+        item.score_sum += score * count
+        item.question_sum += question_count * count
+        field = TestStatistics.get_bucket_field(score, question_count)
+        setattr(item, field, getattr(item, field) + count)
+
+    TestStatistics.objects.bulk_create(
+        statistics.values(),
+        batch_size=1000,
+        update_conflicts=True,
+        unique_fields=['test'],
+        update_fields=['result_count', 'score_sum', 'question_sum'] + [
+            field for _, field in TestStatistics.SCORE_BUCKETS
+        ],
+    )
+    for test_id in statistics:
+        caching.invalidate_on_commit(TestStatistics, test_id)
+    return len(statistics)
@@ -0,0 +1,124 @@
+"""
+Database-backed task queue, so background work needs no broker. Tasks are
+functions registered with @task in the `tasks` module of an app and queued with
+enqueue(); the `run_tasks` command runs them.
+
+Delivery is at least once: a task whose worker died is taken over by another
+worker once its lease expires. Tasks registered with atomic=True (the default) run
+in a transaction together with their removal from the queue while holding its row
+lock, so their database writes are applied exactly once; other side effects must
+tolerate being repeated. Failed tasks are retried with an exponential backoff.
+"""
+import time
+import traceback
+from datetime import timedelta
+
+from django.db import transaction
+from django.db.models import F, Q
+from django.utils import timezone
+
+from tests.models import Task
+from tests.utils import metrics
+
+
+RETRY_DELAY = 10
+MAX_RETRY_DELAY = 60 * 60
+
+_registry = {}
+
+
+def task(name=None, max_attempts=5, atomic=True):
+    """
+    Register a function taking JSON serializable keyword arguments as a task.
+    """
+    def register(func):
+        func.task_name = name or f'{func.__module__}.{func.__name__}'
+        func.max_attempts = max_attempts
+        func.atomic = atomic
+        _registry[func.task_name] = func
+        return func
+    return register
+
+
+def enqueue(func, delay=0, **payload):
+    """
+    Queue a call of the task `func`. Enqueued inside a transaction, the task is
+    only visible to workers, and only exists, if the transaction commits.
+    """
+    return Task.objects.create(
+        name=func.task_name,
+        payload=payload,
+        max_attempts=func.max_attempts,
+        run_at=timezone.now() + timedelta(seconds=delay),
+    )
+
+
+@transaction.atomic
+def claim(worker, batch_size, lease):
+    """
+    Lease up to `batch_size` due tasks to `worker` for `lease` seconds,
+    including running tasks whose lease expired.
+    """
+    now = timezone.now()
+    task_ids = list(Task.objects
+                    .select_for_update(skip_locked=True)
+                    .filter(Q(status=Task.PENDING, run_at__lte=now)
+                            | Q(status=Task.RUNNING, locked_until__lt=now))
+                    .order_by('run_at')
+                    .values_list('pk', flat=True)[:batch_size])
+    Task.objects.filter(pk__in=task_ids).update(
+        status=Task.RUNNING,
+        locked_by=worker,
+        locked_until=now + timedelta(seconds=lease),
+        attempts=F('attempts') + 1,
+        updated_at=now,
+    )
+    return list(Task.objects.filter(pk__in=task_ids).order_by('run_at'))
+
+
+def _run(task, func, worker):
+    if not func.atomic:
+        func(**task.payload)
+        Task.objects.filter(pk=task.pk, locked_by=worker).delete()
+        return True
+
+    with transaction.atomic():
+        # Locked until committed, so another worker cannot take the task over meanwhile
+        if not Task.objects.select_for_update().filter(pk=task.pk, locked_by=worker).exists():
+            return False
+        func(**task.payload)
+        Task.objects.filter(pk=task.pk).delete()
+    return True
+
+
+def _fail(task, worker, error):
+    if task.attempts >= task.max_attempts:
+        changes = {'status': Task.FAILED}
+    else:
+        delay = min(RETRY_DELAY * 2 ** (task.attempts - 1), MAX_RETRY_DELAY)
+        changes = {'status': Task.PENDING, 'run_at': timezone.now() + timedelta(seconds=delay)}
+    Task.objects.filter(pk=task.pk, locked_by=worker).update(
+        last_error=error, locked_by='', locked_until=None, updated_at=timezone.now(), **changes,
+    )
+    return changes['status']
+
+
+def execute(task, worker):
+    """
+    Run a claimed task and return its outcome: `done`, `retry`, `failed` or `lost`
+    when another worker took it over.
+    """
+    func = _registry.get(task.name)
+    if func is None:
+        task.attempts = task.max_attempts
+        _fail(task, worker, f'Unknown task {task.name}')
+        return 'failed'
+
+    start = time.perf_counter()
+    try:
+        outcome = 'done' if _run(task, func, worker) else 'lost'
+    except Exception:
+        outcome = 'retry' if _fail(task, worker, traceback.format_exc()) == Task.PENDING else 'failed'
+    metrics.observe('task_seconds', time.perf_counter() - start, task=task.name)
+    metrics.increment('tasks_total', task=task.name, outcome=outcome)
+    return outcome
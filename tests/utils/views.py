@@ -1,14 +1,206 @@
-from django.core.exceptions import PermissionDenied
+import hashlib
+import inspect
+from contextlib import contextmanager
+
+from asgiref.sync import sync_to_async
+from django.conf import settings
+from django.core.cache import cache
+from django.db import connection
+from django.http import HttpResponse
+from django.utils.cache import get_conditional_response, patch_cache_control, patch_vary_headers
+from django.utils.http import http_date
+
+from tests.utils import metrics
+
+
+class LazyQueryError(RuntimeError):
+    pass
+
+
+@contextmanager
+def forbid_queries(label):
+    def blocker(execute, sql, params, many, context):
+        raise LazyQueryError(f'{label} ran a query while rendering its template: {sql}')
+
+    with connection.execute_wrapper(blocker):
+        yield
+
+
+class QuerySetShapeMixin:
+    """
+    Declares the relations and columns the template of a view needs.
+    With STRICT_TEMPLATE_QUERIES enabled the template is rendered with queries
+    forbidden, so a template walking a relation that was not fetched fails loudly.
+    """
+
+    select_related = ()
+    prefetch_related = ()
+    only = ()
+
+    def get_queryset(self):
+        queryset = super().get_queryset()
+        if self.select_related:
+            queryset = queryset.select_related(*self.select_related)
+        if self.prefetch_related:
+            queryset = queryset.prefetch_related(*self.prefetch_related)
+        if self.only:
+            queryset = queryset.only(*self.only)
+        return queryset
+
+    def render_to_response(self, context, **response_kwargs):
+        response = super().render_to_response(context, **response_kwargs)
+        if settings.STRICT_TEMPLATE_QUERIES:
+            # The session user is resolved lazily by the base template
+            self.request.user.is_authenticated
+            with forbid_queries(self.__class__.__name__), metrics.timer(
+                'stage_seconds', stage='template_render', view=self.request.resolver_match.view_name,
+            ):
+                response.render()
+        return response
 
 
 class OwnerRequiredMixin:
+    """
+    Restricts a single object view to the objects of the current user.
+    Objects of other users are excluded by the queryset, so they get a 404 without
+    being loaded, and the object is fetched once per request.
+    Anonymous users are expected to be rejected by LoginRequiredMixin first.
+    """
 
     def get_queryset(self):
         queryset = super().get_queryset()
         return queryset.filter(user=self.request.user)
 
+    def get_object(self, queryset=None):
+        if queryset is not None:
+            return super().get_object(queryset)
+        if not hasattr(self, '_object'):
+            self._object = super().get_object()
+        return self._object
+
+
+class AsyncViewMixin:
+    """
+    Base of async views, must come first in the bases. Resolves the session user
+    with the async API before sync mixins (LoginRequiredMixin), querysets and
+    templates read `request.user`, which would otherwise query from the event loop.
+    """
+
+    async def dispatch(self, request, *args, **kwargs):
+        request.user = await request.auser()
+        response = super().dispatch(request, *args, **kwargs)
+        if inspect.isawaitable(response):
+            response = await response
+        return response
+
+    async def arender_to_response(self, **kwargs):
+        """
+        Build the context and the response off the event loop: context data may read
+        cache keys (tests.utils.caching) and render_to_response() may render the template.
+        """
+        return await sync_to_async(lambda: self.render_to_response(self.get_context_data(**kwargs)))()
+
+
+class AnonymousPageCacheMixin:
+    """
+    Serves GET requests of anonymous users from a cache of the rendered page, keyed
+    by get_page_cache_key() (not cached when it returns None), so most anonymous
+    views touch neither the database nor the templates. Pages setting cookies, like
+    a CSRF token, are never cached. Comes after AsyncViewMixin.
+    """
+
+    def get_page_cache_key(self):
+        return None
+
+    async def dispatch(self, request, *args, **kwargs):
+        key = None
+        if request.method == 'GET' and not request.user.is_authenticated:
+            key = await sync_to_async(self.get_page_cache_key)()
+        view_name = request.resolver_match.view_name if request.resolver_match else ''
+        if key is not None:
+            cached = await cache.aget(key)
+            metrics.increment('page_cache_requests_total', view=view_name, result='miss' if cached is None else 'hit')
+            if cached is not None:
+                content, content_type = cached
+                return HttpResponse(content, content_type=content_type)
+
+        response = super().dispatch(request, *args, **kwargs)
+        if inspect.isawaitable(response):
+            response = await response
+        if (key is not None and response.status_code == 200 and not response.streaming
+                and not response.cookies and not request.META.get('CSRF_COOKIE_NEEDS_UPDATE')):
+            if hasattr(response, 'render'):
+                await sync_to_async(response.render)()
+            await cache.aset(key, (response.content, response['Content-Type']), settings.PAGE_CACHE_TIMEOUT)
+        return response
+
+
+class ConditionalGetMixin:
+    """
+    Answers conditional GETs with 304 Not Modified before the view runs, from
+    validators that are cheaper to compute than the page. The ETag is built from the
+    values returned by get_validators() and the user, whose name every page shows.
+    Responses are stored by browsers and shared caches but revalidated on every use.
+    Comes after AsyncViewMixin and LoginRequiredMixin.
+    """
+
+    etag = None
+    last_modified = None
+
+    def get_validators(self):
+        """
+        Return (values the page depends on, last modification datetime or None),
+        or None to always run the view. A last modification time is only given when
+        it covers everything on the page, counters included.
+        """
+        return None
+
+    def get_not_modified_response(self, request):
+        if request.method not in ('GET', 'HEAD'):
+            return None
+        validators = self.get_validators()
+        if validators is None:
+            return None
+        values, last_modified = validators
+        self.etag = 'W/"%s"' % hashlib.md5(repr([request.user.pk, *values]).encode()).hexdigest()
+        self.last_modified = int(last_modified.timestamp()) if last_modified else None
+        return get_conditional_response(request, etag=self.etag, last_modified=self.last_modified)
+
+    def add_validators(self, request, response):
+        if self.etag is None or response.status_code not in (200, 304):
+            return response
+        response.headers.setdefault('ETag', self.etag)
+        if self.last_modified is not None:
+            response.headers.setdefault('Last-Modified', http_date(self.last_modified))
+        if request.user.is_authenticated:
+            patch_cache_control(response, private=True, no_cache=True)
+        else:
+            patch_cache_control(response, no_cache=True)
+        patch_vary_headers(response, ['Cookie'])
+        return response
+
     def dispatch(self, request, *args, **kwargs):
-        obj = self.get_object()
-        if obj.user != request.user:
-            raise PermissionDenied
-        return super().dispatch(request, *args, **kwargs)
+        if self.view_is_async:
+            return self.adispatch(request, *args, **kwargs)
+        response = self.get_not_modified_response(request) or super().dispatch(request, *args, **kwargs)
+        return self.add_validators(request, response)
+
+    async def adispatch(self, request, *args, **kwargs):
+        response = await sync_to_async(self.get_not_modified_response)(request)
+        if response is None:
+            response = super().dispatch(request, *args, **kwargs)
+            if inspect.isawaitable(response):
+                response = await response
+        return self.add_validators(request, response)
+
+
+class AsyncListMixin(AsyncViewMixin):
+    """
+    Async GET of a ListView using CursorPaginationMixin, the page is fetched
+    with the async ORM before the context is built.
+    """
+
+    async def get(self, request, *args, **kwargs):
+        self.object_list = self.get_queryset()
+        await self.apaginate_queryset(self.object_list, self.get_paginate_by(self.object_list))
+        return await self.arender_to_response()
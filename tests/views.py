@@ -1,202 +1,239 @@
+import hashlib
+
+from asgiref.sync import sync_to_async
+from django.conf import settings
 from django.contrib.auth.mixins import LoginRequiredMixin
+from django.core.cache import cache
+from django.core.exceptions import PermissionDenied
 from django.db import transaction
-from django.db.models import Prefetch
-from django.shortcuts import redirect
+from django.db.models import Count, Max, OuterRef, Prefetch, Subquery
+from django.core.handlers.asgi import ASGIRequest
+from django.http import Http404, HttpResponse, QueryDict, StreamingHttpResponse
+from django.shortcuts import aget_object_or_404, get_object_or_404, redirect
 from django.urls import reverse_lazy
-from django.views.generic import ListView, DetailView, CreateView, UpdateView, DeleteView
-from tests.models import Test, Result, Comment
-from tests.forms import TestForm, QuestionFormSet, AnswerFormSet, CommentForm
-from tests.utils.views import OwnerRequiredMixin
+from django.utils.crypto import constant_time_compare
+from django.views.generic import View, ListView, DetailView, CreateView, UpdateView, DeleteView
+from tests.models import Test, Question, Answer, Result, Comment, TestStatistics
+from tests.forms import TestForm, TestFormTree, CommentForm
+from tests.tasks import record_result
+from tests.utils import caching, exports, metrics, snapshots, tasks
+from tests.utils.pagination import CursorPaginationMixin, apaginate_by_cursor
+from tests.utils.search import search_tests, update_search_vector
+from tests.utils.views import (
+    AnonymousPageCacheMixin, AsyncListMixin, AsyncViewMixin, ConditionalGetMixin, OwnerRequiredMixin,
+    QuerySetShapeMixin,
+)
+
+
+class TestListFilterMixin:
+    """
+    Search, filters and sorts of the test list, read from the query parameters.
+    """
+
+    # Only sorts backed by an index (see Test.Meta.indexes), `rank` is available while searching
+    ordering_fields = ['created_at', 'passes_number', 'name']
+
+    def get_order_by(self):
+        search = self.request.GET.get('search')
+        default = '-rank' if search else '-created_at'
+        order_by = self.request.GET.get('order_by', default)
+        allowed = self.ordering_fields + ['rank'] if search else self.ordering_fields
+        name = order_by[1:] if order_by.startswith('-') else order_by
+        return order_by if name in allowed else default
+
+    def get_list_params(self):
+        """
+        The query parameters the list depends on, normalized so that equivalent
+        requests share their cache entries. Invalid ranges are ignored.
+        """
+        if not hasattr(self, 'list_params'):
+            get = self.request.GET
+            self.list_params = {
+                'search': ' '.join(get.get('search', '').split()),
+                'order_by': self.get_order_by(),
+                'list_type': 'my' if get.get('list_type') == 'my' else 'all',
+                'cursor': get.get('cursor', ''),
+            }
+            for name in ('passes_number_min', 'passes_number_max'):
+                value = get.get(name, '').strip()
+                self.list_params[name] = int(value) if value.isdigit() else None
+        return self.list_params
+
+    def filter_tests(self, queryset):
+        params = self.get_list_params()
+        if params['search']:
+            queryset = search_tests(queryset, params['search'])
+        queryset = queryset.order_by(params['order_by'])
+        if params['list_type'] == 'my':
+            queryset = queryset.filter(user=self.request.user)
+        if params['passes_number_min'] is not None:
+            queryset = queryset.filter(passes_number__gte=params['passes_number_min'])
+        if params['passes_number_max'] is not None:
+            queryset = queryset.filter(passes_number__lte=params['passes_number_max'])
+        return queryset
 
 
-class TestListView(ListView):
+class TestListView(AsyncListMixin, AnonymousPageCacheMixin, TestListFilterMixin, QuerySetShapeMixin,
+                   CursorPaginationMixin, ListView):
     model = Test
     template_name = 'pages/test_list.html'
     paginate_by = 10
+    select_related = ['user']
+    only = ['name', 'description', 'passes_number', 'created_at', 'user__username']
+
+    def get_list_cache_key(self, *parts):
+        params = self.get_list_params()
+        # `my` lists depend on the user and are not cached
+        if params['list_type'] == 'my':
+            return None
+        query = QueryDict(mutable=True)
+        for name, value in sorted(params.items()):
+            if value not in ('', None):
+                query[name] = value
+        return caching.make_key(Test, *parts, hashlib.md5(query.urlencode().encode()).hexdigest())
+
+    def get_page_cache_key(self):
+        # The page repeats the raw parameters in its forms
+        key = self.get_list_cache_key('list_page')
+        if key is not None:
+            key += ':' + hashlib.md5(self.request.GET.urlencode().encode()).hexdigest()
+        return key
 
     def get_queryset(self):
-        search = self.request.GET.get('search')
-        order_by = self.request.GET.get('order_by', '-created_at').split('__')[0]
-        passes_number_min = self.request.GET.get('passes_number_min')
-        passes_number_max = self.request.GET.get('passes_number_max')
-        list_type = self.request.GET.get('list_type', 'all')
+        return self.filter_tests(super().get_queryset())
 
-        queryset = super().get_queryset().order_by(order_by)
-        if list_type == 'my':
-            queryset = queryset.filter(user=self.request.user)
-        if search:
-            queryset = queryset.filter(name__icontains=search)
-        if passes_number_min:
-            queryset = queryset.filter(passes_number__gte=passes_number_min)
-        if passes_number_max:
-            queryset = queryset.filter(passes_number__lte=passes_number_max)
+    async def apaginate_queryset(self, queryset, page_size):
+        key = await sync_to_async(self.get_list_cache_key)('list', page_size)
+        if key is not None:
+            self.cursor_page = await cache.aget(key)
+        if self.cursor_page is None:
+            await super().apaginate_queryset(queryset, page_size)
+            if key is not None:
+                await cache.aset(key, self.cursor_page, settings.PAGE_CACHE_TIMEOUT)
 
-        return queryset
+    def get_context_data(self, **kwargs):
+        context = super().get_context_data(**kwargs)
+        context['list_cache_key'] = self.get_list_cache_key('list_items')
+        context['page_cache_timeout'] = settings.PAGE_CACHE_TIMEOUT
+        return context
 
-    def get(self, request, *args, **kwargs):
+    async def get(self, request, *args, **kwargs):
         if self.request.GET.get('list_type', 'all') == 'my' and not self.request.user.is_authenticated:
             query_params = self.request.GET.copy()
             query_params.pop('list_type')
             return redirect(f'{reverse_lazy("test_list")}?{query_params.urlencode()}')
-        return super().get(request, *args, **kwargs)
+        return await super().get(request, *args, **kwargs)
 
 
-class TestDetailView(DetailView):
+class TestDetailView(AsyncViewMixin, ConditionalGetMixin, AnonymousPageCacheMixin, QuerySetShapeMixin, DetailView):
     model = Test
     template_name = 'pages/test_detail.html'
-
-    def get_queryset(self):
-        return super().get_queryset().prefetch_related(
-            Prefetch('comments', queryset=Comment.objects.order_by('-created_at')),
-            'comments__user',
-        )
+    select_related = ['user', 'statistics']
+    only = ['name', 'description', 'passes_number', 'comment_count', 'user__username', 'statistics']
+
+    def get_detail_cache_key(self, *parts):
+        # Comments and counters invalidate the test, results its statistics
+        pk = self.kwargs[self.pk_url_kwarg]
+        return caching.make_key(Test, *parts, caching.get_version(TestStatistics, pk), pk=pk)
+
+    def get_page_cache_key(self):
+        return self.get_detail_cache_key('detail_page')
+
+    def get_validators(self):
+        # Counters are updated without touching `updated_at`
+        key = self.get_detail_cache_key('validators')
+        values = cache.get(key)
+        if values is None:
+            comments = Comment.objects.filter(test=OuterRef('pk')).order_by().values('test')
+            values = list(Test.objects.filter(pk=self.kwargs[self.pk_url_kwarg]).annotate(
+                comments_updated_at=Subquery(comments.annotate(value=Max('updated_at')).values('value')),
+                comments_number=Subquery(comments.annotate(value=Count('pk')).values('value')),
+            ).values_list(
+                'updated_at', 'passes_number', 'comment_count', 'statistics__result_count', 'user__username',
+                'comments_updated_at', 'comments_number',
+            ))
+            cache.set(key, values, settings.PAGE_CACHE_TIMEOUT)
+        return (values, None) if values else None
+
+    async def get(self, request, *args, **kwargs):
+        key = await sync_to_async(self.get_detail_cache_key)('detail')
+        cached = await cache.aget(key)
+        if cached is None:
+            self.object = await aget_object_or_404(self.get_queryset(), pk=self.kwargs[self.pk_url_kwarg])
+            self.comment_page = await apaginate_by_cursor(
+                TestCommentListView.get_comments(self.object.pk),
+                TestCommentListView.paginate_by,
+            )
+            await cache.aset(key, (self.object, self.comment_page), settings.PAGE_CACHE_TIMEOUT)
+        else:
+            self.object, self.comment_page = cached
+        self.detail_cache_key = key
+        return await self.arender_to_response(object=self.object)
 
     def get_context_data(self, **kwargs):
         context = super().get_context_data(**kwargs)
         context['comment_form'] = CommentForm()
+        context['comment_page'] = self.comment_page
+        context['detail_cache_key'] = self.detail_cache_key
+        context['page_cache_timeout'] = settings.PAGE_CACHE_TIMEOUT
         return context
 
 
-class TestCreateView(LoginRequiredMixin, CreateView):
-    model = Test
-    form_class = TestForm
-    template_name = 'pages/test_form.html'
+class TestFormTreeMixin:
+    """
+    Builds the question/answer formsets of the edited test once per request
+    and reuses them for validation, saving and re-rendering.
+    """
+
+    def get_form_tree(self):
+        if not hasattr(self, 'form_tree'):
+            self.form_tree = TestFormTree(self.request.POST or None, instance=self.object)
+        return self.form_tree
 
     def get_success_url(self):
         return reverse_lazy('test_detail', kwargs={'pk': self.object.pk})
 
     def get_context_data(self, **kwargs):
         data = super().get_context_data(**kwargs)
-        if self.request.POST:
-            data['question_formset'] = QuestionFormSet(self.request.POST)
-            data['answer_formsets'] = [
-                AnswerFormSet(self.request.POST, prefix=f'questions-{question_form.prefix.split('-')[1]}-answers')
-                for question_form in data['question_formset']
-            ]
-        else:
-            data['question_formset'] = QuestionFormSet()
-            data['answer_formsets'] = [
-                AnswerFormSet(prefix=f'questions-{question_form.prefix.split('-')[1]}-answers')
-                for question_form in data['question_formset']
-            ]
-        data['active_question_count'] = len(data['question_formset']) - len(data['question_formset'].deleted_forms)
-        data['empty_question_form'] = QuestionFormSet().empty_form
-        data['template_answer_formset'] = AnswerFormSet(
-            prefix=f'questions-__question_prefix__-answers'
-        )
-        data['template_question_prefix'] = 'questions-__question_prefix__'
+        data.update(self.get_form_tree().get_context_data())
         return data
 
     @transaction.atomic
     def form_valid(self, form):
-        context = self.get_context_data()
-        question_formset = context['question_formset']
-        answer_formsets = context['answer_formsets']
+        form_tree = self.get_form_tree()
+        with metrics.timer('stage_seconds', stage='formset_validation'):
+            valid = form_tree.is_valid()
+        if not valid:
+            return self.form_invalid(form)
 
-        form.instance.user = self.request.user
-        instance = form.save()
-
-        if question_formset.is_valid():
-            question_formset.instance = instance
-            question_formset.save()
-
-            for i, question_form in enumerate(question_formset):
-                answer_formset = answer_formsets[i]
-                if question_form.cleaned_data.get('DELETE') is False:
-                    if answer_formset.is_valid():
-                        answer_formset.instance = question_form.instance
-                        answer_formset.save()
-                    else:
-                        transaction.set_rollback(True)
-                        return self.render_to_response({
-                            **context,
-                            'form': form,
-                        })
-
-            self.object = instance
-            return redirect(self.get_success_url())
-        else:
-            transaction.set_rollback(True)
-            return self.render_to_response({
-                **context,
-                'form': form,
-            })
+        self.object = form.save()
+        with metrics.timer('stage_seconds', stage='formset_save'):
+            form_tree.save(self.object)
+        update_search_vector(self.object.pk)
+        return redirect(self.get_success_url())
 
 
-class TestUpdateView(OwnerRequiredMixin, LoginRequiredMixin, UpdateView):
+class TestCreateView(LoginRequiredMixin, TestFormTreeMixin, CreateView):
     model = Test
     form_class = TestForm
     template_name = 'pages/test_form.html'
 
-    def get_queryset(self):
-        return super().get_queryset().prefetch_related('questions__answers')
+    def form_valid(self, form):
+        form.instance.user = self.request.user
+        return super().form_valid(form)
 
-    def get_success_url(self):
-        return reverse_lazy('test_detail', kwargs={'pk': self.object.pk})
 
-    def get_context_data(self, **kwargs):
-        data = super().get_context_data(**kwargs)
-        if self.request.POST:
-            data['question_formset'] = QuestionFormSet(self.request.POST, instance=self.object)
-            initial_question_count = int(data['question_formset'].management_form.cleaned_data['INITIAL_FORMS'])
-            data['answer_formsets'] = [
-                AnswerFormSet(
-                    self.request.POST,
-                    instance=question_form.instance if index < initial_question_count else None,
-                    prefix=f'questions-{question_form.prefix.split('-')[1]}-answers'
-                )
-                for index, question_form in enumerate(data['question_formset'])
-            ]
-        else:
-            data['question_formset'] = QuestionFormSet(instance=self.object)
-            data['answer_formsets'] = [
-                AnswerFormSet(
-                    instance=question_form.instance,
-                    prefix=f'questions-{question_form.prefix.split('-')[1]}-answers'
-                )
-                for question_form in data['question_formset']
-            ]
-        data['active_question_count'] = len(data['question_formset']) - len(data['question_formset'].deleted_forms)
-        data['empty_question_form'] = QuestionFormSet().empty_form
-        data['template_answer_formset'] = AnswerFormSet(
-            prefix=f'questions-__question_prefix__-answers'
-        )
-        data['template_question_prefix'] = 'questions-__question_prefix__'
-        return data
+class TestUpdateView(OwnerRequiredMixin, LoginRequiredMixin, TestFormTreeMixin, UpdateView):
+    model = Test
+    form_class = TestForm
+    template_name = 'pages/test_form.html'
 
-    @transaction.atomic
-    def form_valid(self, form):
-        context = self.get_context_data()
-        question_formset = context['question_formset']
-        answer_formsets = context['answer_formsets']
-
-        instance = form.save()
-
-        if question_formset.is_valid():
-            question_formset.instance = instance
-            question_formset.save()
-
-            for i, question_form in enumerate(question_formset):
-                answer_formset = answer_formsets[i]
-                if question_form.cleaned_data.get('DELETE') is False:
-                    if answer_formset.is_valid():
-                        answer_formset.instance = question_form.instance
-                        answer_formset.save()
-                    else:
-                        transaction.set_rollback(True)
-                        return self.render_to_response({
-                            **context,
-                            'form': form,
-                        })
-
-            self.object = instance
-            return redirect(self.get_success_url())
-        else:
-            transaction.set_rollback(True)
-            return self.render_to_response({
-                **context,
-                'form': form,
-            })
+    def get_queryset(self):
+        # The form tree reads questions and answers from the prefetch cache
+        return super().get_queryset().prefetch_related(
+            Prefetch('questions', queryset=Question.objects.order_by('pk')),
+            Prefetch('questions__answers', queryset=Answer.objects.order_by('pk')),
+        )
 
 
 class TestDeleteView(OwnerRequiredMixin, LoginRequiredMixin, DeleteView):
@@ -221,57 +258,131 @@ class TestCommentView(LoginRequiredMixin, CreateView):
         return super().form_valid(form)
 
 
-class TestPassView(LoginRequiredMixin, DetailView):
+class TestCommentListView(AsyncListMixin, QuerySetShapeMixin, CursorPaginationMixin, ListView):
+    """
+    HTML fragment with the next page of comments, loaded by the test detail page.
+    """
+
+    model = Comment
+    template_name = 'partials/comment_list.html'
+    context_object_name = 'comments'
+    paginate_by = 10
+
+    @staticmethod
+    def get_comments(test_id):
+        return (Comment.objects
+                .filter(test_id=test_id)
+                .select_related('user')
+                .only('test', 'text', 'created_at', 'user__username')
+                .order_by('-created_at'))
+
+    def get_queryset(self):
+        return self.get_comments(self.kwargs['pk'])
+
+    def get_context_data(self, **kwargs):
+        context = super().get_context_data(**kwargs)
+        context['comment_page'] = context['page_obj']
+        context['test_pk'] = self.kwargs['pk']
+        return context
+
+
+class TestPassView(LoginRequiredMixin, QuerySetShapeMixin, DetailView):
     model = Test
     template_name = 'pages/test_pass.html'
+    only = ['name']
 
     def get_success_url(self, result_pk):
         return reverse_lazy('test_result', kwargs={'pk': result_pk})
 
     def get_context_data(self, **kwargs):
         context = super().get_context_data(**kwargs)
-        context['questions'] = self.object.questions.prefetch_related('answers')
+        context['questions'] = snapshots.get_snapshot(self.object.pk).questions
         return context
 
-    @transaction.atomic
     def post(self, request, *args, **kwargs):
         self.object = self.get_object()
-        questions = self.object.questions.prefetch_related('answers')
-        score = 0
-
-        for question in questions:
-            selected_answer_id = request.POST.get(f'question_{question.id}')
-            if selected_answer_id:
-                selected_answer = question.answers.get(id=selected_answer_id)
-                if selected_answer.is_correct:
-                    score += 1
-
-        result_instance = Result.objects.create(
-            user=request.user,
-            test=self.object,
-            score=score,
-            question_count=questions.count(),
-        )
-
-        self.object.passes_number += 1
-        self.object.save()
+        with metrics.timer('stage_seconds', stage='grading'):
+            grading = snapshots.get_snapshot(self.object.pk).answer_key.grade(request.POST)
+
+        with transaction.atomic():
+            result_instance = Result.objects.create(
+                user=request.user,
+                test=self.object,
+                score=grading.score,
+                question_count=grading.question_count,
+            )
+            # Counters and statistics are updated by the task worker
+            tasks.enqueue(record_result, result_id=result_instance.pk)
 
         return redirect(self.get_success_url(result_instance.pk))
 
 
-class TestResultsView(LoginRequiredMixin, ListView):
+class TestResultsView(AsyncListMixin, LoginRequiredMixin, ConditionalGetMixin, QuerySetShapeMixin,
+                      CursorPaginationMixin, ListView):
     model = Result
     template_name = 'pages/test_results.html'
     paginate_by = 10
     ordering = ['-created_at']
+    select_related = ['test']
+    only = ['score', 'question_count', 'created_at', 'test__name']
 
     def get_queryset(self):
-        return (super().get_queryset()
-                .filter(user=self.request.user)
-                .select_related('test'))
+        return super().get_queryset().filter(user=self.request.user)
+
+    def get_validators(self):
+        # The count catches deleted results, whatever their date
+        values = Result.objects.filter(user=self.request.user).aggregate(
+            count=Count('pk'), updated_at=Max('updated_at'), test_updated_at=Max('test__updated_at'),
+        )
+        return list(values.values()), None
 
 
-class TestResultView(OwnerRequiredMixin, LoginRequiredMixin, DetailView):
+class TestResultView(OwnerRequiredMixin, LoginRequiredMixin, ConditionalGetMixin, QuerySetShapeMixin, DetailView):
     model = Result
     template_name = 'pages/test_result.html'
+    select_related = ['test__user']
+    only = ['user', 'score', 'question_count', 'created_at', 'test__name', 'test__user__username']
+
+    def get_validators(self):
+        values = (self.get_queryset()
+                  .filter(pk=self.kwargs[self.pk_url_kwarg])
+                  .values_list('updated_at', 'test__updated_at', 'test__user__username')
+                  .first())
+        if values is None:
+            return None
+        return values, max(values[:2])
+
 
+class TestResultsExportView(LoginRequiredMixin, View):
+    """
+    All results of a test of the current user, streamed as CSV or JSON Lines (?format=jsonl).
+    """
+
+    def get(self, request, *args, **kwargs):
+        export_format = request.GET.get('format', 'csv')
+        if export_format not in exports.EXPORT_CONTENT_TYPES:
+            raise Http404('Unknown export format')
+        test = get_object_or_404(Test.objects.filter(user=request.user).only('pk'), pk=kwargs['pk'])
+
+        content = exports.stream_results(test.pk, export_format)
+        if isinstance(request, ASGIRequest):
+            content = exports.aiterate(content)
+        response = StreamingHttpResponse(content, content_type=exports.EXPORT_CONTENT_TYPES[export_format])
+        response['Content-Disposition'] = f'attachment; filename="test-{test.pk}-results.{export_format}"'
+        return response
+
+
+class MetricsView(View):
+    """
+    Metrics of the serving worker process in the Prometheus text format.
+    """
+
+    def has_access(self):
+        token = settings.METRICS_TOKEN
+        authorization = self.request.headers.get('Authorization', '')
+        return self.request.user.is_staff or bool(token) and constant_time_compare(authorization, f'Bearer {token}')
+
+    def get(self, request, *args, **kwargs):
+        if not self.has_access():
+            raise PermissionDenied
+        return HttpResponse(metrics.render(), content_type='text/plain; version=0.0.4; charset=utf-8')
@@ -0,0 +1,120 @@
+"""
+PostgreSQL backend handing out connections from a process-wide pool.
+Django 5.0 has no pool support for psycopg2, so the stock backend is wrapped:
+connections are checked out when Django connects and given back when it closes
+them (at the end of every request, the pool requires CONN_MAX_AGE = 0).
+
+Configured with the POOL entry of the database settings, see DATABASES.
+"""
+import threading
+import time
+
+import psycopg2.extras
+from django.core.exceptions import ImproperlyConfigured
+from django.db.backends.postgresql import base
+from psycopg2 import pool
+
+from tests.utils import metrics
+
+
+class ConnectionPool:
+
+    def __init__(self, alias, conn_params, min_size=1, max_size=10, timeout=10.0, health_checks=True):
+        self.alias = alias
+        self.timeout = timeout
+        self.health_checks = health_checks
+        self.in_use = 0
+        self.lock = threading.Lock()
+        # psycopg2 pools fail instead of waiting when exhausted
+        self.slots = threading.BoundedSemaphore(max_size)
+        self.pool = pool.ThreadedConnectionPool(min_size, max_size, **conn_params)
+        # min_size connections are opened up front, but psycopg2 also closes every
+        # returned connection beyond minconn, so raise it to keep the pool warm
+        self.pool.minconn = max_size
+
+    def is_usable(self, connection):
+        if connection.closed:
+            return False
+        if not self.health_checks:
+            return True
+        try:
+            with connection.cursor() as cursor:
+                cursor.execute('SELECT 1')
+            connection.rollback()
+        except base.Database.Error:
+            return False
+        return True
+
+    def getconn(self):
+        start = time.perf_counter()
+        if not self.slots.acquire(timeout=self.timeout):
+            metrics.increment('db_pool_timeouts_total', alias=self.alias)
+            raise base.Database.OperationalError(
+                f'No connection of the {self.alias!r} pool became available within {self.timeout}s'
+            )
+        metrics.observe('db_pool_wait_seconds', time.perf_counter() - start, alias=self.alias)
+
+        try:
+            connection = self.pool.getconn()
+            while not self.is_usable(connection):
+                metrics.increment('db_pool_discarded_total', alias=self.alias)
+                self.pool.putconn(connection, close=True)
+                connection = self.pool.getconn()
+        except Exception:
+            self.slots.release()
+            raise
+
+        self.set_in_use(1)
+        metrics.increment('db_pool_checkouts_total', alias=self.alias)
+        return connection
+
+    def putconn(self, connection):
+        try:
+            # Open transactions are rolled back, broken connections are closed
+            self.pool.putconn(connection, close=bool(connection.closed))
+        finally:
+            self.set_in_use(-1)
+            self.slots.release()
+
+    def set_in_use(self, delta):
+        with self.lock:
+            self.in_use += delta
+            metrics.set_gauge('db_pool_connections_in_use', self.in_use, alias=self.alias)
+
+
+_pools = {}
+_pools_lock = threading.Lock()
+
+
+class DatabaseWrapper(base.DatabaseWrapper):
+
+    def get_pool(self, conn_params):
+        with _pools_lock:
+            if self.alias not in _pools:
+                options = self.settings_dict.get('POOL', {})
+                _pools[self.alias] = ConnectionPool(
+                    self.alias,
+                    conn_params,
+                    min_size=options.get('MIN_SIZE', 1),
+                    max_size=options.get('MAX_SIZE', 10),
+                    timeout=options.get('TIMEOUT', 10.0),
+                    health_checks=self.settings_dict['CONN_HEALTH_CHECKS'],
+                )
+            return _pools[self.alias]
+
+    def get_new_connection(self, conn_params):
+        # The stock implementation for psycopg2, checking the connection out of the pool
+        isolation_level = self.settings_dict['OPTIONS'].get('isolation_level', base.IsolationLevel.READ_COMMITTED)
+        try:
+            self.isolation_level = base.IsolationLevel(isolation_level)
+        except ValueError:
+            raise ImproperlyConfigured(f'Invalid transaction isolation level {isolation_level} specified.')
+        connection = self.get_pool(conn_params).getconn()
+        connection.isolation_level = self.isolation_level
+        psycopg2.extras.register_default_jsonb(conn_or_curs=connection, loads=lambda x: x)
+        return connection
+
+    def _close(self):
+        if self.connection is not None:
+            with self.wrap_database_errors:
+                _pools[self.alias].putconn(self.connection)
@@ -72,10 +72,13 @@ INSTALLED_APPS = DJANGO_APPS + PROJECT_APPS + THIRD_PARTY_APPS
 MIDDLEWARE = [
     'django.middleware.security.SecurityMiddleware',
     'whitenoise.middleware.WhiteNoiseMiddleware',
+    'tests.middleware.QueryBudgetMiddleware',
     'django.contrib.sessions.middleware.SessionMiddleware',
     'django.middleware.common.CommonMiddleware',
     'django.middleware.csrf.CsrfViewMiddleware',
     'django.contrib.auth.middleware.AuthenticationMiddleware',
+    'tests.middleware.ProfilingMiddleware',
+    'tests.middleware.StageTimingMiddleware',
     'django.contrib.messages.middleware.MessageMiddleware',
     'django.middleware.clickjacking.XFrameOptionsMiddleware',
     "allauth.account.middleware.AccountMiddleware",
@@ -109,6 +112,81 @@ WSGI_APPLICATION = 'tests_app.wsgi.application'
 DATABASES = {
     'default': env.db(),
 }
+# Persistent connections: reuse a connection for DB_CONN_MAX_AGE seconds (0 closes it at
+# the end of every request) after checking it still works. Not in ASGI mode (gunicorn.conf.py),
+# where async requests do not reuse the connections of their threads
+DATABASES['default']['CONN_MAX_AGE'] = env.int(
+    'DB_CONN_MAX_AGE', default=0 if env('SERVER_MODE', default='wsgi') == 'asgi' else 60,
+)
+DATABASES['default']['CONN_HEALTH_CHECKS'] = env.bool('DB_CONN_HEALTH_CHECKS', default=True)
+# Behind pgbouncer in transaction pooling mode server-side cursors (QuerySet.iterator()) do not survive
+DATABASES['default']['DISABLE_SERVER_SIDE_CURSORS'] = env.bool('DB_PGBOUNCER', default=False)
+# Process-wide connection pool for PostgreSQL, see tests_app/db/postgresql_pool
+if env.bool('DB_POOL', default=False) and DATABASES['default']['ENGINE'] == 'django.db.backends.postgresql':
+    DATABASES['default'].update({
+        'ENGINE': 'tests_app.db.postgresql_pool',
+        # Connections go back to the pool at the end of every request
+        'CONN_MAX_AGE': 0,
+        'POOL': {
+            # Connections opened at startup
+            'MIN_SIZE': env.int('DB_POOL_MIN_SIZE', default=env.int('DB_POOL_MAX_SIZE', default=10)),
+            'MAX_SIZE': env.int('DB_POOL_MAX_SIZE', default=10),
+            'TIMEOUT': env.float('DB_POOL_TIMEOUT', default=10.0),
+        },
+    })
+
+
+# Cache
+# Shared backend in production, e.g. CACHE_URL=redis://host:6379/0 (redis is in requirements.txt) or
+# filecache:///tmp/tests-app-cache, or the default process-local memory cache for development and tests
+
+CACHES = {
+    'default': env.cache('CACHE_URL', default='locmemcache://'),
+}
+
+# Seconds the rendered test list and detail pages stay cached. Saves invalidate the detail pages,
+# list pages may show outdated counters for that long
+PAGE_CACHE_TIMEOUT = env.int('PAGE_CACHE_TIMEOUT', default=300)
+
+# Bearer token allowing scrapers to read the metrics endpoint (staff users can always read it)
+METRICS_TOKEN = env('METRICS_TOKEN', default='')
+
+# Queries a view may run per request with warm caches, including the session and user lookups
+# (tests.middleware.QueryBudgetMiddleware): `warn` logs, `raise` fails the request, `off`
+QUERY_BUDGET_MODE = env('QUERY_BUDGET_MODE', default='warn')
+QUERY_BUDGETS = {
+    'test_list': 3,
+    # Validators, test and comments when not cached
+    'test_detail': 5,
+    'test_comments': 3,
+    'test_create': {'GET': 2, 'POST': 8},
+    # Deleting questions cascades to their answers
+    'test_update': {'GET': 5, 'POST': 12},
+    # One more when the question snapshot is not cached
+    'test_pass': {'GET': 4, 'POST': 6},
+    # With the query of their conditional GET validators
+    'test_results': 4,
+    'test_result': 4,
+    'api-test-list': 3,
+    'api-test-detail': 3,
+    # One more when the question snapshot is not cached
+    'api-test-questions': 4,
+    'api-result-list': 3,
+    'api-result-detail': 3,
+    # Tests, other users, results, counter increments and the answer keys not cached
+    'api-submission-list': 6,
+}
+
+# Let staff users profile a request with the X-Profile header or ?_profile (tests.middleware.ProfilingMiddleware)
+PROFILING_ENABLED = env.bool('PROFILING_ENABLED', default=False)
+
+# Render templates of shaped views (tests.utils.views.QuerySetShapeMixin) with queries forbidden
+STRICT_TEMPLATE_QUERIES = env.bool('STRICT_TEMPLATE_QUERIES', default=DEBUG)
+
+
+# The test form posts 15 fields per question (text, answers and their management forms),
+# Django's default of 1000 fields rejects tests of more than ~65 questions
+DATA_UPLOAD_MAX_NUMBER_FIELDS = env.int('DATA_UPLOAD_MAX_NUMBER_FIELDS', default=5000)
 
 
 # Password validation
@@ -29,5 +29,6 @@ urlpatterns = [
     path('accounts/', include('accounts.urls')),
     # Tests
     path('tests/', include('tests.urls')),
+    path('api/', include('tests.api')),
     path('', RedirectView.as_view(url='/tests/', permanent=False)),
 ] + static(settings.MEDIA_URL, document_root=settings.MEDIA_ROOT)